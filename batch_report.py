@@ -0,0 +1,153 @@
+"""Headless provenance reports for every site in a data tree.
+
+Runs the same analysis as the app (parsing, Sc normalization, section
+merge, Figure 5 with outliers, clustering, correlation) without Streamlit,
+one site per worker process, and writes tables, figures and a summary per
+site into the output directory:
+
+    python batch_report.py --data ./data --out ./reports --workers 8
+"""
+import argparse
+import fnmatch
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import matplotlib
+
+matplotlib.use("Agg")  # workers never have a display
+
+import pandas as pd  # noqa: E402
+
+from chemistry import pearson_pairwise, ratio_matrix  # noqa: E402
+from clustering import N_CLUSTERS, build_tree, cut_tree, feature_matrix  # noqa: E402
+from data_store import DATA_PATH, STORE_PATH, DataStore, refresh_store  # noqa: E402
+from figures import draw_correlation, draw_dendrogram, draw_figure5  # noqa: E402
+from outliers import NORM_COLUMNS, figure5_frame  # noqa: E402
+
+
+def _save_figure(fig, path):
+    fig.savefig(path, dpi=120, bbox_inches="tight")
+
+
+def site_report(site, store_root, out_root, reference='Sc'):
+    """Writes the report for one site and returns its summary dict."""
+    started = time.perf_counter()
+    store = DataStore(store_root)
+    out_dir = Path(out_root) / site
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tables = store.tables(site)
+    summary = {"site": site, "version": store.site_version(site), "reference": reference, "files": []}
+
+    def write_csv(df, name):
+        df.to_csv(out_dir / name, index=False)
+        summary["files"].append(name)
+
+    df_ref = store.read(site, 'reference') if 'reference' in tables else None
+    if df_ref is not None:
+        write_csv(df_ref, "reference.csv")
+        summary["samples_per_section"] = {str(k): int(v) for k, v in df_ref['Section'].value_counts().sort_index().items()}
+
+    if 'mineralogy' in tables:
+        df_min = store.read(site, 'mineralogy')
+        write_csv(df_min, "mineralogy.csv")
+        minerals = [c for c in df_min.columns if c not in ('Sample', 'Section')]
+        summary["mineralogy_mean_by_section"] = {
+            str(k): {m: round(float(v), 2) for m, v in row.items()}
+            for k, row in df_min.groupby('Section')[minerals].mean().iterrows()
+        }
+
+    if 'chemistry' in tables:
+        df_chem = store.read(site, 'chemistry')
+        write_csv(df_chem, "chemistry.csv")
+        elements = [c for c in df_chem.columns if c != 'Sample']
+
+        r, counts = pearson_pairwise(df_chem[elements].to_numpy())
+        df_corr = pd.DataFrame(r, index=elements, columns=elements)
+        df_corr.to_csv(out_dir / "correlation.csv")
+        summary["files"].append("correlation.csv")
+        _save_figure(draw_correlation(df_corr, int(counts.max())), out_dir / "correlation.png")
+        summary["files"].append("correlation.png")
+
+        if reference in df_chem.columns:
+            df_ratios = ratio_matrix(df_chem, reference)
+            write_csv(df_ratios, f"ratios_{reference}.csv")
+
+            # --- Figure 5 with robust outliers ---
+            try:
+                df_plot, df_outliers = figure5_frame(df_chem, df_ref, reference)
+            except KeyError:
+                df_plot = None
+            if df_plot is not None and not df_plot.empty:
+                _save_figure(draw_figure5(df_plot, df_outliers, reference), out_dir / "figure5.png")
+                summary["files"].append("figure5.png")
+                summary["outliers"] = [int(s) for s in df_outliers['Sample']]
+                summary["normalized_mean_by_section"] = {
+                    str(k): {c: round(float(v), 4) for c, v in row.items()}
+                    for k, row in df_plot.groupby('Section')[list(NORM_COLUMNS.values())].mean().iterrows()
+                }
+
+            # --- Hierarchical clustering ---
+            df_log = ratio_matrix(df_chem, reference, log=True)
+            if len(df_log) >= 2:
+                samples, X, features = feature_matrix(df_log)
+                tree = build_tree(samples, X, features)
+                n_clusters = min(N_CLUSTERS, len(tree.leaves))
+                write_csv(pd.DataFrame({'Sample': tree.samples, 'Grupo': cut_tree(tree, n_clusters)}), "clusters.csv")
+                _save_figure(draw_dendrogram(tree, n_clusters), out_dir / "dendrogram.png")
+                summary["files"].append("dendrogram.png")
+                summary["cluster_features"] = features
+
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    (out_dir / "summary.json").write_text(json.dumps(summary, indent=1, ensure_ascii=False), encoding="utf-8")
+    return summary
+
+
+def _run_one(args):
+    site = args[0]
+    try:
+        return site_report(*args)
+    except Exception:
+        return {"site": site, "error": traceback.format_exc()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate provenance reports for every site/ditch folder.")
+    parser.add_argument("--data", type=Path, default=DATA_PATH, help="root of the site/ditch CSV folders")
+    parser.add_argument("--store", type=Path, default=STORE_PATH, help="columnar store to (incrementally) refresh")
+    parser.add_argument("--out", type=Path, default=Path("./reports"), help="output directory")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--reference", default="Sc", help="normalization element")
+    parser.add_argument("--sites", nargs="*", default=None, help="glob patterns of site keys to include")
+    args = parser.parse_args(argv)
+
+    # Refresh once up front; workers only read the store
+    manifest = refresh_store(args.data, args.store)
+    sites = list(manifest["sites"])
+    if args.sites:
+        sites = [s for s in sites if any(fnmatch.fnmatch(s, pattern) for pattern in args.sites)]
+    args.out.mkdir(parents=True, exist_ok=True)
+
+    results = []
+    jobs = [(site, args.store, args.out, args.reference) for site in sites]
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers or 1, len(jobs) or 1))) as pool:
+        for future in as_completed([pool.submit(_run_one, job) for job in jobs]):
+            result = future.result()
+            results.append(result)
+            status = "FAILED" if "error" in result else f"{result['seconds']:.2f}s"
+            print(f"{result['site']}: {status}", flush=True)
+
+    results.sort(key=lambda r: r["site"])
+    index = {"store_version": manifest["version"], "reference": args.reference, "sites": results}
+    (args.out / "index.json").write_text(json.dumps(index, indent=1, ensure_ascii=False), encoding="utf-8")
+    failed = [r["site"] for r in results if "error" in r]
+    if failed:
+        print(f"{len(failed)} site(s) failed: {', '.join(failed)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
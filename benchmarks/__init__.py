@@ -0,0 +1 @@
+"""Synthetic datasets and timing harness; run with ``python -m benchmarks.run``."""
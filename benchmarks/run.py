@@ -0,0 +1,183 @@
+"""Time and peak-memory benchmarks of the app's data path on synthetic sites.
+
+For every size a synthetic site is generated (see ``benchmarks.synthetic``)
+and the stages the app runs on a rerun are measured outside Streamlit:
+
+- ingest:    cold ``refresh_store`` (CSV parse -> columnar store)
+- load_data: warm ``load_site_frames`` from the store (what ``load_data`` does)
+- normalize: ``outliers.figure5_frame`` (ratios, Section merge, outlier flags)
+- mineralogy: long-format mineralogy + the per-section aggregates the app sends
+- explorer:  sample index build + one filtered, sorted page of the explorer
+- figure5:   ``draw_figure5`` serialized to PNG, as ``FigureCache.render`` does
+- tables:    Arrow IPC serialization of what ``st.dataframe`` receives (explorer
+             pages and mineralogy aggregates)
+
+Peak memory is what tracemalloc sees (Python and numpy allocations; Arrow
+buffers live outside it).
+
+    python -m benchmarks.run --sizes 25 1000 10000 100000 --json bench.json
+"""
+import argparse
+import gc
+import io
+import json
+import shutil
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import pyarrow as pa  # noqa: E402
+
+from benchmarks.synthetic import TEMPLATE_DIR, write_site  # noqa: E402
+from data_store import DataStore, load_site_frames, refresh_store  # noqa: E402
+from explorer import REFERENCE_COLUMNS, build_sample_index, query  # noqa: E402
+from figures import draw_figure5  # noqa: E402
+from mineralogy import group_means, group_quantiles, histograms, long_frame, ternary_density  # noqa: E402
+from outliers import figure5_frame  # noqa: E402
+
+DEFAULT_SIZES = [25, 1000, 10000, 100000]
+SITE = "synthetic"
+# Share of samples with chemistry but no reference row (at least one per site)
+UNMATCHED_FRACTION = 0.01
+
+
+def measure(fn, repeat=1, memory=True):
+    """Returns (result, best seconds, peak traced MiB or None).
+
+    Timing runs are untraced; tracemalloc slows allocation-heavy code several
+    times over, so peak memory comes from one extra traced run.
+    """
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    if not memory:
+        return result, best, None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, best, peak / 2**20
+
+
+def _mineralogy(store):
+    df_long = long_frame(store, [SITE])
+    return (group_means(df_long), group_quantiles(df_long), histograms(df_long, 'Quartz'),
+            ternary_density(df_long, ['Quartz', 'Plagioclase', 'Phyllosilicates']))
+
+
+def _explorer_pages(df_ref, df_chem, reference):
+    index = build_sample_index(df_ref, df_chem)
+    df_reference_page = query(index, {'Section': [1]}, sort_by='SU', columns=REFERENCE_COLUMNS)[0]
+    df_chemistry_page = query(index, ranges={reference: (0, float('inf'))}, sort_by=reference, ascending=False,
+                              columns=list(df_chem.columns))[0]
+    # Unfiltered, so the samples without a reference row (missing SU) are sorted too
+    df_all_page = query(index, sort_by='SU', columns=REFERENCE_COLUMNS)[0]
+    return df_reference_page, df_chemistry_page, df_all_page
+
+
+def _figure5_png(df_plot, df_outliers, reference):
+    buffer = io.BytesIO()
+    draw_figure5(df_plot, df_outliers, reference).savefig(buffer, format="png", dpi=100, bbox_inches="tight")
+    return len(buffer.getvalue())
+
+
+def _arrow_bytes(*frames):
+    total = 0
+    for df in frames:
+        sink = pa.BufferOutputStream()
+        table = pa.Table.from_pandas(df)
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        total += sink.getvalue().size
+    return total
+
+
+def bench_size(n_samples, work_dir, reference='Sc', repeat=3, memory=True, template_dir=TEMPLATE_DIR):
+    """All stages for one synthetic site of ``n_samples`` sherds; returns a list of records."""
+    data_root = Path(work_dir) / f"data_{n_samples}"
+    store_root = Path(work_dir) / f"store_{n_samples}"
+    n_unmatched = max(1, int(n_samples * UNMATCHED_FRACTION))
+    write_site(data_root / SITE, n_samples, template_dir=template_dir, n_unmatched=n_unmatched)
+
+    records = []
+
+    def record(stage, fn, times=repeat):
+        result, seconds, peak_mib = measure(fn, times, memory)
+        records.append({"samples": n_samples, "stage": stage, "seconds": round(seconds, 4),
+                        "peak_mib": None if peak_mib is None else round(peak_mib, 2)})
+        return result
+
+    def cold_ingest():
+        # Every ingest run starts from an empty store
+        shutil.rmtree(store_root, ignore_errors=True)
+        return refresh_store(data_root, store_root)
+
+    record("ingest", cold_ingest, times=1)
+    store = DataStore(store_root)
+    df_ref, df_chem = record("load_data", lambda: load_site_frames(store, SITE))
+    df_plot, df_outliers = record("normalize", lambda: figure5_frame(df_chem, df_ref, reference))
+    aggregates = record("mineralogy", lambda: _mineralogy(store))
+    pages = record("explorer", lambda: _explorer_pages(df_ref, df_chem, reference))
+    record("figure5", lambda: _figure5_png(df_plot, df_outliers, reference))
+    record("tables", lambda: _arrow_bytes(*pages, *aggregates))
+    return records
+
+
+def _print_table(records):
+    stages = list(dict.fromkeys(r["stage"] for r in records))
+    sizes = list(dict.fromkeys(r["samples"] for r in records))
+    by_key = {(r["samples"], r["stage"]): r for r in records}
+    print(f"{'samples':>8}  " + "  ".join(f"{s:>20}" for s in stages))
+    for n in sizes:
+        cells = []
+        for s in stages:
+            r = by_key.get((n, s))
+            if r is None:
+                cells.append(f"{'-':>20}")
+            elif r["peak_mib"] is None:
+                cells.append(f"{r['seconds']:>19.3f}s")
+            else:
+                cells.append(f"{r['seconds']:>8.3f}s {r['peak_mib']:>7.1f}MiB")
+        print(f"{n:>8}  " + "  ".join(cells))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the app's data path on synthetic sites.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="samples per synthetic site")
+    parser.add_argument("--reference", default="Sc", help="normalization element")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per warm stage (best time is kept)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced peak-memory runs")
+    parser.add_argument("--template", type=Path, default=TEMPLATE_DIR, help="site whose elements/levels are mimicked")
+    parser.add_argument("--work-dir", type=Path, default=None, help="keep generated data/stores here")
+    parser.add_argument("--json", type=Path, default=None, help="also write the records as JSON")
+    args = parser.parse_args(argv)
+
+    work_dir = args.work_dir or Path(tempfile.mkdtemp(prefix="ceramics-bench-"))
+    records = []
+    try:
+        for n in args.sizes:
+            records += bench_size(n, work_dir, args.reference, args.repeat, not args.no_memory, args.template)
+            print(f"{n} samples done", flush=True)
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    _print_table(records)
+    if args.json:
+        args.json.write_text(json.dumps(records, indent=1), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,112 @@
+"""Synthetic ceramic datasets in the exact CSV formats of ``data/ditch1``.
+
+The element list, typical concentrations and 'n.d.' rates are taken from a
+template site (the shipped ditch1 by default), so the generated files go
+through the same parsing paths as the real exports: a wide
+``chemical_contents.csv`` with 'Element' rows and 'n.d.'/'%' tokens, one
+reference file and one mineralogy file per section.
+
+    python -m benchmarks.synthetic --samples 10000 --out ./bench_data/synthetic_10000
+"""
+import argparse
+import csv
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from chemistry import NOT_DETECTED, parse_chemical_table
+
+TEMPLATE_DIR = Path("./data/ditch1")
+MINERALS = ['Plagioclase', 'Quartz', 'Amphibole', 'Phyllosilicates', 'K-Feldspar', 'Hematite']
+MINERAL_SHARES = [31, 27, 14, 22, 4, 2]
+TYPES = ['1—plate', '2—bowl', '3—carinated bowl', '4—bowl', '4—deeper bowl', '5—spherical', '7—bag-type vessel', 'undet.']
+MAJOR_OXIDES = {'Na₂O', 'K₂O', 'Fe₂O₃', 'CaO'}
+
+
+def _lab_number(value):
+    # 3 significant digits, never in exponent notation: '1180', '1.50', '0.0631'
+    return np.format_float_positional(value, precision=3, unique=False, fractional=False).rstrip('.')
+
+
+_lab_numbers = np.frompyfunc(_lab_number, 1, 1)
+
+
+def _template_profile(template_dir):
+    """(elements, log-mean, log-std, n.d. rate) per element from the template chemistry."""
+    table = parse_chemical_table(Path(template_dir) / "chemical_contents.csv")
+    with np.errstate(divide='ignore', invalid='ignore'):
+        logs = np.log(np.where(table.values > 0, table.values, np.nan))
+    log_mean = np.nan_to_num(np.nanmean(logs, axis=0), nan=0.0)
+    log_std = np.nan_to_num(np.nanstd(logs, axis=0), nan=0.1)
+    nd_rate = ((table.flags & NOT_DETECTED) > 0).mean(axis=0)
+    return table.elements, log_mean, np.maximum(log_std, 0.05), nd_rate
+
+
+def write_site(out_dir, n_samples, n_sections=2, template_dir=TEMPLATE_DIR, seed=0, n_unmatched=0):
+    """Writes one synthetic site folder with ``n_samples`` sherds spread over sections.
+
+    The last ``n_unmatched`` samples only get chemistry, no reference or
+    mineralogy rows (analysed sherds not yet catalogued).
+    """
+    rng = np.random.default_rng(seed)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    samples = np.arange(1, n_samples + 1) * 3 + 17  # non-contiguous ids, like the real numbering
+    sections = np.sort(rng.integers(1, n_sections + 1, size=n_samples))
+    sections[:n_sections] = np.arange(1, n_sections + 1)  # every section gets at least one sample
+    sections.sort()
+
+    # --- Chemistry: Element x Sample, formatted like the lab export ---
+    elements, log_mean, log_std, nd_rate = _template_profile(template_dir)
+    section_shift = rng.normal(0, 0.1, size=(n_sections + 1, len(elements)))[sections]
+    values = np.exp(log_mean + section_shift + rng.normal(size=(n_samples, len(elements))) * log_std)
+    not_detected = rng.random(values.shape) < nd_rate
+    percent = np.zeros(values.shape, dtype=bool)
+    for j, element in enumerate(elements):
+        if element in MAJOR_OXIDES:  # a few '3.9%'-style cells on the oxides
+            percent[:, j] = (rng.random(n_samples) < 0.01) & ~not_detected[:, j]
+    cells = _lab_numbers(values)
+    cells[percent] += '%'
+    cells[not_detected] = 'n.d.'
+    # csv.writer on the Element x Sample rows: DataFrame.to_csv with one
+    # column per sample took minutes at 100k samples
+    with open(out_dir / "chemical_contents.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(['Element', *samples.astype(str)])
+        writer.writerows([element, *cells[:, j]] for j, element in enumerate(elements))
+
+    # --- Reference and mineralogy, one file per section ---
+    shares = rng.dirichlet(np.asarray(MINERAL_SHARES, dtype=float) + 1, size=n_samples)
+    minerals = np.round(shares * 100).astype(int)
+    catalogued = np.arange(n_samples) < n_samples - n_unmatched
+    for section in range(1, n_sections + 1):
+        rows = (sections == section) & catalogued
+        n = int(rows.sum())
+        types = rng.choice(TYPES, size=n)
+        sub_types = [f"{t[0]}.{rng.integers(1, 4)}" if t[0].isdigit() else "" for t in types]
+        pd.DataFrame({
+            'Sample Reference': samples[rows],
+            'SU': rng.integers(100, 150, size=n),
+            'Section': section,
+            'Type': types,
+            'Sub-Type': sub_types,
+        }).to_csv(out_dir / f"reference_and_description_section_{section}.csv", index=False)
+
+        df_min = pd.DataFrame(minerals[rows], columns=MINERALS)
+        df_min.insert(0, 'Sample', samples[rows])
+        df_min.to_csv(out_dir / f"semi-quantitative_mineralogical_composition_section_{section}.csv", index=False)
+    return out_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic site folder in the ditch1 CSV formats.")
+    parser.add_argument("--samples", type=int, default=1000)
+    parser.add_argument("--sections", type=int, default=2)
+    parser.add_argument("--out", type=Path, required=True)
+    parser.add_argument("--template", type=Path, default=TEMPLATE_DIR)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--unmatched", type=int, default=0, help="samples with chemistry only")
+    args = parser.parse_args()
+    print(write_site(args.out, args.samples, args.sections, args.template, args.seed, args.unmatched))
@@ -0,0 +1,172 @@
+"""NAA chemical table parsing.
+
+``chemical_contents.csv`` is wide: one row per element and one column per
+sample. The parser reads the rows with ``csv.reader`` into one object array
+(a few dozen element rows, however many sample columns) and converts it to
+floats in a single vectorized pass, keeping censored values ('n.d.',
+'<0.5') and '%'-suffixed entries in a parallel flag array instead of
+silently losing them.
+"""
+import csv
+import io
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Flag bits stored alongside every value
+NOT_DETECTED = 1   # 'n.d.' / 'n.d'
+BELOW_LIMIT = 2    # '<0.5' -> value NaN, limit kept in ``limits``
+PERCENT = 4        # '3.9%' -> value 3.9
+
+ND_TOKENS = ['n.d.', 'n.d', 'nd', 'n.d.a.']
+# Indices the table reports next to the elements (ratios and sums of REE); they are not
+# parts of the composition, so they are never normalized, clustered or decomposed
+DERIVED_COLUMNS = {'Eu/Eu*', '(La/Yb)n', 'ΣREE'}
+
+ChemicalTable = namedtuple("ChemicalTable", ["samples", "elements", "values", "flags", "limits"])
+
+
+def _parse_block(raw):
+    """Converts a 2-D array of strings to (values, flags, limits) in one pass."""
+    shape = raw.shape
+    cells = pd.Series(raw.ravel(), dtype=object).str.strip()
+
+    not_detected = cells.str.lower().isin(ND_TOKENS).to_numpy()
+    below_limit = cells.str.startswith('<', na=False).to_numpy()
+    percent = cells.str.endswith('%', na=False).to_numpy()
+
+    numbers = pd.to_numeric(cells.str.strip('<%'), errors='coerce').to_numpy(dtype=np.float64)
+    limits = np.where(below_limit, numbers, np.nan)
+    values = np.where(not_detected | below_limit, np.nan, numbers)
+
+    flags = (not_detected * NOT_DETECTED | below_limit * BELOW_LIMIT | percent * PERCENT).astype(np.uint8)
+    return values.reshape(shape), flags.reshape(shape), limits.reshape(shape)
+
+
+def _text_rows(source):
+    """CSV rows of a path or of a (bytes or text) file-like object such as an upload."""
+    if hasattr(source, 'read'):
+        data = source.read()
+        text = data.decode('utf-8-sig') if isinstance(data, bytes) else data
+        return list(csv.reader(io.StringIO(text)))
+    with open(source, encoding='utf-8-sig', newline='') as f:
+        return list(csv.reader(f))
+
+
+def parse_chemical_table(source):
+    """Parses a wide Element x Sample CSV (path or file-like) into a ChemicalTable.
+
+    The wide dimension is the samples, so rows are read as plain lists (no
+    per-column frame is ever built) and parsed together. Short rows are
+    padded with empty cells, which parse as missing. The returned arrays
+    are Sample x Element.
+    """
+    rows = [row for row in _text_rows(source) if any(cell.strip() for cell in row)]
+    if len(rows) < 2:
+        raise ValueError("chemical table has no rows")
+    header, body = rows[0], rows[1:]
+
+    # Header columns after 'Element' are the sample numbers
+    sample_ids = pd.to_numeric(pd.Series(header[1:], dtype=object).str.strip(), errors='coerce').to_numpy()
+    keep = ~np.isnan(sample_ids)
+    width = len(header)
+
+    raw = np.full((len(body), width - 1), '', dtype=object)
+    for i, row in enumerate(body):
+        cells = row[1:width]
+        raw[i, :len(cells)] = cells
+    elements = [row[0].strip() for row in body]
+    values, flags, limits = _parse_block(raw[:, keep])
+
+    # One transpose at the end: Element x Sample -> Sample x Element
+    return ChemicalTable(
+        samples=sample_ids[keep].astype(np.int64),
+        elements=elements,
+        values=np.ascontiguousarray(values.T),
+        flags=np.ascontiguousarray(flags.T),
+        limits=np.ascontiguousarray(limits.T),
+    )
+
+
+def chemistry_frame(table):
+    """Sample x Element DataFrame of values, with a leading 'Sample' column."""
+    df = pd.DataFrame(table.values, columns=table.elements)
+    df.insert(0, 'Sample', table.samples)
+    return df
+
+
+def flags_frame(table):
+    """Same layout as ``chemistry_frame`` but holding the censoring flags."""
+    df = pd.DataFrame(table.flags, columns=table.elements)
+    df.insert(0, 'Sample', table.samples)
+    return df
+
+
+def limits_frame(table):
+    """Same layout as ``chemistry_frame`` but holding the detection limits ('<0.5' -> 0.5)."""
+    df = pd.DataFrame(table.limits, columns=table.elements)
+    df.insert(0, 'Sample', table.samples)
+    return df
+
+
+# --- Normalization ---
+def ratio_matrix(df_chem, reference='Sc', log=False):
+    """Divides every element column by ``reference`` in one vectorized pass.
+
+    Generalizes the Sc normalization of Figure 5 to any reference element.
+    Rows whose reference value is missing or not positive are dropped and
+    infinities become NaN. With ``log=True`` the natural log of the ratios
+    is returned (non-positive ratios become NaN). The 'Sample' column is kept;
+    the reference column itself (always 1) and the derived indices
+    (``DERIVED_COLUMNS``) are left out.
+    """
+    if reference not in df_chem.columns or reference in DERIVED_COLUMNS:
+        raise KeyError(f"reference element '{reference}' is not an element column of the chemical data")
+
+    elements = [c for c in df_chem.columns if c not in ('Sample', reference) and c not in DERIVED_COLUMNS]
+    ref_values = df_chem[reference].to_numpy(dtype=np.float64)
+    keep = ref_values > 0  # NaN compares False as well
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = df_chem[elements].to_numpy(dtype=np.float64)[keep] / ref_values[keep, None]
+        if log:
+            ratios = np.log(np.where(ratios > 0, ratios, np.nan))
+    ratios[~np.isfinite(ratios)] = np.nan
+
+    df_ratios = pd.DataFrame(ratios, columns=elements)
+    df_ratios.insert(0, 'Sample', df_chem['Sample'].to_numpy()[keep])
+    return df_ratios
+
+
+# --- Correlation ---
+def pearson_pairwise(values, min_periods=3):
+    """Pearson correlation between columns using pairwise-complete observations.
+
+    NaNs (e.g. 'n.d.') only remove the sample from the pairs that involve
+    that element. All pairs are computed together with masked matrix
+    products instead of a loop over element pairs. Returns ``(r, n)`` where
+    ``n`` is the number of samples behind each coefficient; pairs with fewer
+    than ``min_periods`` samples are NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    present = ~np.isnan(values)
+    mask = present.astype(np.float64)
+    # Centering first keeps the sums of squares well conditioned
+    counts = np.maximum(mask.sum(axis=0), 1)
+    means = np.where(present, values, 0.0).sum(axis=0) / counts
+    centered = np.where(present, values - means, 0.0)
+
+    n = mask.T @ mask
+    sum_x = centered.T @ mask          # [i, j]: sum of x_i where x_j is also present
+    sum_y = sum_x.T
+    sum_xx = (centered ** 2).T @ mask
+    sum_yy = sum_xx.T
+    sum_xy = centered.T @ centered
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = n * sum_xy - sum_x * sum_y
+        var = (n * sum_xx - sum_x ** 2) * (n * sum_yy - sum_y ** 2)
+        r = cov / np.sqrt(var)
+    r[(n < min_periods) | ~np.isfinite(r)] = np.nan
+    return np.clip(r, -1.0, 1.0), n.astype(np.int64)
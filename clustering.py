@@ -0,0 +1,192 @@
+"""Hierarchical clustering of the chemical fingerprints.
+
+Samples are clustered on their log Sc-normalized concentrations. Up to
+``MAX_LEAVES`` samples the linkage is built on the samples themselves; above
+that the samples are first summarized into k-means prototypes and the
+linkage is built on the prototypes, so memory and time stay bounded for
+reference collections of tens of thousands of sherds. New samples are
+placed on the nearest existing leaf instead of recomputing the linkage.
+"""
+import hashlib
+import os
+import re
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+from scipy.cluster.hierarchy import fcluster, linkage
+
+from chemistry import DERIVED_COLUMNS
+
+MAX_LEAVES = 2000
+N_CLUSTERS = 3  # default cut of the dendrogram
+REBUILD_FRACTION = 0.25  # rebuild once this share of samples was only placed, not clustered
+
+ClusterTree = namedtuple("ClusterTree", ["samples", "features", "leaves", "assignment", "linkage", "placed", "source"])
+
+
+# --- Features ---
+def feature_matrix(df_ratios, max_missing=0.2):
+    """Returns (samples, X, features) from a log-ratio frame.
+
+    Elements missing (e.g. 'n.d.') in more than ``max_missing`` of the
+    samples are dropped; remaining gaps are filled with the column median.
+    Derived indices (Eu/Eu*, ΣREE, ...) are never features.
+    """
+    elements = [c for c in df_ratios.columns
+                if c not in ('Sample', 'Sample Reference', 'Section') and c not in DERIVED_COLUMNS]
+    values = df_ratios[elements].to_numpy(dtype=np.float64)
+    keep = np.isnan(values).mean(axis=0) <= max_missing
+    values = values[:, keep]
+
+    medians = np.nanmedian(values, axis=0)
+    missing = np.isnan(values)
+    values[missing] = np.take(medians, np.nonzero(missing)[1])
+
+    features = [e for e, k in zip(elements, keep) if k]
+    return df_ratios['Sample'].to_numpy(), values, features
+
+
+def data_hash(samples, X, features):
+    digest = hashlib.sha256()
+    digest.update("|".join(map(str, features)).encode())
+    digest.update(np.ascontiguousarray(samples).tobytes())
+    digest.update(np.ascontiguousarray(X).tobytes())
+    return digest.hexdigest()[:16]
+
+
+# --- Building ---
+def _nearest(points, centers, chunk=4096):
+    """Index of the nearest center for every point, in memory-bounded chunks."""
+    center_sq = (centers ** 2).sum(axis=1)
+    out = np.empty(len(points), dtype=np.int64)
+    for start in range(0, len(points), chunk):
+        block = points[start:start + chunk]
+        dist = center_sq[None, :] - 2 * block @ centers.T  # |p|^2 is constant per row
+        out[start:start + chunk] = dist.argmin(axis=1)
+    return out
+
+
+def _prototypes(X, k, iterations=10, seed=0):
+    """Plain Lloyd k-means, vectorized over all samples per iteration."""
+    rng = np.random.default_rng(seed)
+    centers = X[rng.choice(len(X), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _nearest(X, centers)
+        counts = np.bincount(assignment, minlength=k)
+        sums = np.stack([np.bincount(assignment, weights=X[:, j], minlength=k) for j in range(X.shape[1])], axis=1)
+        filled = counts > 0
+        centers[filled] = sums[filled] / counts[filled, None]
+    return centers, _nearest(X, centers)
+
+
+def build_tree(samples, X, features, method='ward', max_leaves=MAX_LEAVES):
+    """Computes the linkage, on prototypes when there are more than ``max_leaves`` samples."""
+    if len(X) < 2:
+        raise ValueError("at least two samples are needed for clustering")
+    if len(X) <= max_leaves:
+        leaves, assignment = X, np.arange(len(X))
+    else:
+        leaves, assignment = _prototypes(X, max_leaves)
+    return ClusterTree(
+        samples=np.asarray(samples), features=list(features), leaves=leaves,
+        assignment=assignment, linkage=linkage(leaves, method=method), placed=0,
+        source=data_hash(samples, X, features),
+    )
+
+
+def place_samples(tree, samples, X, source=''):
+    """Adds samples to an existing tree by attaching each one to its nearest leaf.
+
+    ``source`` is the data hash of all samples the extended tree now holds.
+    """
+    assignment = _nearest(X, tree.leaves)
+    return tree._replace(
+        samples=np.concatenate([tree.samples, samples]),
+        assignment=np.concatenate([tree.assignment, assignment]),
+        placed=tree.placed + len(samples),
+        source=source,
+    )
+
+
+def cut_tree(tree, n_clusters):
+    """Flat cluster label (1..n_clusters) for every sample in the tree."""
+    leaf_labels = fcluster(tree.linkage, t=n_clusters, criterion='maxclust')
+    return leaf_labels[tree.assignment]
+
+
+# --- Disk cache ---
+def write_npz(path, **arrays):
+    """np.savez through a temporary file, so concurrent readers never load a half-written archive."""
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp.open("wb") as f:
+        np.savez(f, **arrays)
+    tmp.replace(path)
+
+
+def prune_cache(cache_dir, pattern, keep):
+    """Deletes files in ``cache_dir`` whose whole name matches the regex ``pattern``, except ``keep``.
+
+    Called right after a newer entry is written, so superseded data hashes
+    or store versions do not pile up. Files another process still has open
+    (Windows) are skipped.
+    """
+    keep = {Path(path).name for path in keep}
+    for path in Path(cache_dir).iterdir():
+        if path.name not in keep and re.fullmatch(pattern, path.name):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+def save_tree(tree, path):
+    write_npz(path, samples=tree.samples, features=np.asarray(tree.features), leaves=tree.leaves,
+              assignment=tree.assignment, linkage=tree.linkage, placed=tree.placed, source=tree.source)
+
+
+def load_tree(path):
+    with np.load(path) as data:
+        return ClusterTree(
+            samples=data['samples'], features=[str(f) for f in data['features']], leaves=data['leaves'],
+            assignment=data['assignment'], linkage=data['linkage'], placed=int(data['placed']),
+            source=str(data['source']),
+        )
+
+
+def cached_tree(samples, X, features, cache_dir, key):
+    """Loads the tree for this exact data, extends the previous one, or rebuilds.
+
+    Trees are stored as ``<key>-<data hash>.npz``; ``<key>-latest.npz`` is the
+    most recent one, and older hashes of ``key`` are deleted once it is written.
+    If the latest tree covers a subset of ``samples`` with unchanged values,
+    only the new samples are placed into it.
+    """
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    exact = cache_dir / f"{key}-{data_hash(samples, X, features)}.npz"
+    latest = cache_dir / f"{key}-latest.npz"
+    if exact.exists():
+        return load_tree(exact)
+
+    tree = None
+    if latest.exists():
+        previous = load_tree(latest)
+        row_of = {s: i for i, s in enumerate(samples)}
+        old_rows = [row_of.get(s) for s in previous.samples]
+        if previous.features == list(features) and None not in old_rows:
+            # The old samples must still carry exactly the values they were clustered with
+            unchanged = data_hash(previous.samples, X[old_rows], features) == previous.source
+            new_rows = np.setdiff1d(np.arange(len(samples)), old_rows)
+            if unchanged and previous.placed + len(new_rows) <= REBUILD_FRACTION * len(samples):
+                rows = np.concatenate([old_rows, new_rows]).astype(np.int64)
+                tree = place_samples(previous, samples[new_rows], X[new_rows],
+                                     source=data_hash(samples[rows], X[rows], features))
+
+    if tree is None:
+        tree = build_tree(samples, X, features)
+    save_tree(tree, exact)
+    save_tree(tree, latest)
+    prune_cache(cache_dir, rf"{re.escape(key)}-[0-9a-f]{{16}}\.npz", keep=[exact, latest])
+    return tree
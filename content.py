@@ -0,0 +1,210 @@
+"""Static text of the page, shared by the live app and the snapshot export.
+
+``main.py`` renders these strings with Streamlit; ``snapshot.py`` turns the
+same strings into a static HTML page, so both always show the same text.
+Strings marked as HTML are rendered with ``unsafe_allow_html=True``.
+"""
+
+PAGE_TITLE = "Cerâmicas Calcolíticas: Santa Vitória"
+LOGO_PATH = "ist_logo.webp"
+LOGO_WIDTH_PX = 200
+TITLE = "Património Cultural e Ciências: Caso de Estudo"
+SUBTITLE = "Fingerprinting Ceramics from the Chalcolithic Santa Vitória Enclosure (SW Iberia)"
+
+INTRO = """
+*Apresenta-se um resumo e análise do artigo científico: "Marques, R. et al. (2024). Fingerprinting Ceramics from the Chalcolithic Santa Vitória Enclosure (SW Iberia). Minerals 14, 399." 
+ Este trabalho foi realizado pelos elementos do grupo 5 constituído por Guilherme Prestes (LEMEC), Guilherme Amaro (LEMEC), Liedson Cunha (LEIC).
+ [Link para o artigo](https://www.mdpi.com/2075-163X/14/4/399)*
+
+**Objetivo:** Introduzir o artigo científico e identificar os problemas abordados; analisar os resultados obtidos e as metodologias aplicadas; apresentar as conlcusões chegadas e as possíveis contribuições para o avanço do caso de estudo. 
+"""
+
+# --- Expander sections (bodies are HTML) ---
+SECTION_1_TITLE = "1. Introdução: Estudo realizado no Recinto Calcolítico de Santa Vitória"
+SECTION_1 = """
+    <h3 style="color:#388cb0;"><b>Património Estudado:</b></h3> 
+    O estudo foca em cerâmicas arqueológicas provenientes do recinto Calcolítico de Santa Vitória, 
+    situado em Campo Maior, no Alentejo, sul de Portugal. O recinto, caracterizado por dois fossos 
+    concêntricos de traçado sinuoso com lóbulos semicirculares contíguos, datada da segunda metade do 3.º 
+    milénio a.C. (Fosso 1: 2556-2040 cal AC; Fosso 2: 2460-2200 cal AC, segundo datações por radiocarbono). 
+    Classificado como de interesse público nacional, Santa Vitória é considerado um espaço cerimonial,
+    testemunho das práticas sociais, rituais e cosmológicas das comunidades pré-históricas da região.
+    
+    <ul>
+    <li><b style="color:#808b96; font-size:20px;">
+        Objetivo principal:</b> 
+        Contribuir para a contextualização dos artefactos cerâmicos, o que implica compreender  
+        as tecnologias de produção utilizadas e a origem das matérias-primas, entretanto, discutir o papel
+        do recinto no panorama regional.
+    </li>
+    <li><b style="color:#808b96; font-size:20px;">Amostras:</b> 
+    Foram estudados 25 fragmentos cerâmicos recolhidos em duas secções distintas do Fosso 1. Estes fragmentos 
+    incluem diferentes tipologias, como tigelas, contas (pequenos objetos que poderão ter sido utilizados como 
+    decoração) e fragmentos indiferenciados (peças cuja forma original é difícil de identificar).
+    </li>
+    </ul>
+    
+    <p style="color:Gray;"><i>(Ver Figuras 1 & 2 no artigo)</i></p>
+    
+    <h3 style="color:#388cb0;">Questões de Investigação Abordadas</h3>
+    
+    O artigo aborda as seguintes questões:
+    
+    <ol>
+    <li><b style="color:#808b96;">Procedência das cerâmicas:</b> As cerâmicas foram produzidas localmente ou terão sido importadas de outros locais? </li>
+    <li><b style="color:#808b96;">Técnicas de fabrico:</b> Que tecnologias foram usados na produção destas cerâmicas? </li>
+    <li><b style="color:#808b96;">Diferenças entre as seções do fosso:</b> Existem variações significativas na composição mineralógica e química das cerâmicas? </li>
+    <li><b style="color:#808b96;">Implicações sociais:</b> Que informações as cerâmicas fornecem sobre as dinâmicas sociais da comunidade? </li>
+    </ol>
+    """
+
+SECTION_2_TITLE = "2. Metodologia: Técnicas usadas para estudar as Cerâmicas"
+SECTION_2 = """
+    <h3 style="color:#388cb0;">Métodos de Análise</h3>
+    
+    Para determinar a proveniência das matérias-primas, assim como as tecnologias de produção 
+    e a diferença composicional entre os fragmentos, foram usados diferentes técnicas para 
+    determinar tanto os componentes químicos como mineralógicos presentes nos fragmentos. 
+    
+    <ul>
+    <li><b style="color:#808b96; font-size:20px;">1. Difração de Raios-X (XRD):</b> 
+        <ul>
+            <li>Identificar as fases minerais presentes nas cerâmicas, tais como: quartzo, plagioclásios, anfibólios, filossilicatos, feldspatos alcalinos e hematite.</li>
+            <li>A presença de filossilicatos e a ausência de minerais característicos de altas temperaturas apontam para uma queima das cerâmicas a temperaturas inferiores a 850°C.</li>
+        </ul>
+    </li>
+    
+    <li><b style="color:#808b96; font-size:20px;">2. Análise por Ativação Neutrônica (NAA):</b> 
+        <ul>
+            <li>Quantificar 24 elementos químicos, incluindo elementos maioritários (ex.: Na, K, Fe) e em traços (ex.: terras raras, Rb, Cs).</li>
+            <li>Normalização com escândio (Sc) para minimizar variações naturais e antrópicas.</li>
+        </ul>
+    </li>
+    
+    <li><b style="color:#808b96; font-size:20px;">3. Análises Estatísticas:</b> 
+        <ul>
+            <li><b>Clusterização hierárquica:</b> Agrupar amostras com composições químicas semelhantes.</li>
+            <li><b>Correlação de Pearson:</b> Avaliar relações entre elementos químicos.</li>
+        </ul>
+    </li>
+    </ul>
+    
+    <h3 style="color:#388cb0;">Resultados Principais</h3>
+    
+    <ul>
+    <li><b style="color:#808b96;">Proveniência local:</b> A composição mineralógica das cerâmicas, dominada por plagioclásios, anfibólios e quartzo, reflete o contexto geológico regional, caracterizado por gabros, dioritos e rochas híbridas da região.</li>
+    
+    <li><b style="color:#808b96;">Tecnologia de produção:</b> 
+        <ul>
+            <li>Temperatura de queima inferior a 850°C.</li>
+            <li>Uso de Temperantes: Adição de grãos não plásticos (temper) em proporções variáveis, com maior evidência na Secção 1, onde os fragmentos <br> apresentam uma textura mais grosseira devido ao tamanho superior dos grãos.</li>
+        </ul>
+    </li>
+    
+    <li><b style="color:#808b96;">Diferenças entre seções:</b> 
+        <ul>
+            <li><b>Seção 1:</b> Maior proporção de grãos grossos e menor teor de ferro.</li>
+            <li><b>Seção 2:</b> Maior heterogeneidade química e maior presença de anfibólios/ferro.</li>
+        </ul>
+    </li>
+    
+    <li><b style="color:#808b96;">Amostras atípicas:</b> 
+        <ul>
+            <li><b>Amostra 163:</b> Alto teor de potássio (K), associado a feldspatos alcalinos.</li>
+            <li><b>Amostra 183:</b> Alto teor de sódio (Na), ligado a plagioclásios.</li>
+        </ul>
+    </li>
+    </ul>
+    
+    <p style="color:Gray;"><i>(Ver Figuras 3 & 4 no artigo)</i></p>
+    """
+
+SECTION_3_TITLE = "3. Dados: Apresentação dos Resultados Obtidos"
+
+# --- Section 3 headings and captions (``{...}`` fields are filled in with str.format) ---
+SAMPLES_TITLE = "3.1 Informação das Amostras"
+SECTOR_COUNT = "Sector {section}: n={count}"
+MINERALOGY_TITLE = "3.2 Composição Mineralógica (Resultados DRX / XRD)"
+MINERAL_MEANS_TITLE = "Médias por sector (%)"
+MINERAL_QUANTILES_CAPTION = "Quantis 10/25/50/75/90% de cada mineral por sector; n = número de amostras."
+TERNARY_CAPTION = ("Proporções dos três minerais refechadas a 100%; cada círculo é uma célula da grelha (10%) "
+                   "com área proporcional ao número de amostras.")
+CHEMISTRY_TITLE = "3.3 Composição Química (Resultados AAN / NAA)"
+CHEMISTRY_TABLE_TITLE = "Tabela de Dados Químicos (Majoritários em %, Vestigiais em mg/kg)"
+FIGURE5_TITLE = "Diferenças Químicas (Normalizadas a {reference})"
+FIGURE5_SOURCE = "(Baseado na Figura 5 do artigo)"
+FIGURE5_CAPTION = ("Amostras anotadas: outliers multivariados por sector (distância de Mahalanobis robusta (MCD) "
+                   "acima do quantil 97.5% de χ², ou clássica acima do quantil 97.5% da sua distribuição Beta "
+                   "exacta em sectores pequenos): {samples}.")
+FIGURE5_NO_OUTLIERS = "nenhuma"
+CLUSTERING_TITLE = "Clusterização Hierárquica (log de razões a {reference})"
+CORRELATION_TITLE = "Correlação de Pearson entre Elementos"
+CORRELATION_CAPTION = "Valores 'n.d.' são excluídos par a par; pares com menos de 3 amostras ficam em branco."
+
+SECTION_4_TITLE = "4. Discussão e Conclusões"
+SECTION_4 = """
+    <h3 style="color:#388cb0;">Conclusões e Implicações</h3>
+                
+    As cerâmicas calcolíticas de Santa Vitória sugerem uma produção local dominante, compatível com o contexto geológico regional (gabros e dioritos), embora trocas regionais não sejam descartáveis. Variações tecnológicas, como diferenças nos temperantes e heterogeneidade química entre secções, indicam distinções nas práticas de produção ou grupos sociais. 
+    
+    <li><b style="color:#808b96;">Limitações:</b>
+        <ul>
+            <li>Falta de análise de matérias-primas locais para comparação direta.</li>
+            <li>Número limitado de amostras por tipologia cerâmica.</li>
+        </ul>
+    </li>
+    
+    <li><b style="color:#808b96;">Perspectivas futuras:</b>
+        <ul>
+            <li>Estudos complementares com argilas regionais e mais amostras para confirmar padrões.</li>
+            <li>Análises isotópicas ou de luminescência para refinamento cronológico.</li>
+        </ul>
+    </li>
+    </ul>
+    """
+
+# --- Student perspective, reference and footer, in page order ---
+# (kind, text); kind is "divider", "html", "markdown", "subheader" or "caption"
+CLOSING = [
+    ("divider", ""),
+    ("html", """
+    <h3 style="color:#076aa6;"> Contributo para a Área de Estudo</h3>
+    """),
+    ("markdown", """
+**Enquanto estudantes de licenciatura, é pertinente começarmos a pensar de que modo podemos aplicar os conhecimentos adquiridos em benefício de um propósito maior. 
+Portanto, a questão que se pretende abordar nesta secção é a seguinte: de que forma podemos intervir ou contribuir para o avanço da área de estudo apresentada?**
+"""),
+    ("subheader", "Licenciatura em Engenharia Mecânica (LEMEC)"),
+    ("markdown", """
+*   Melhorar a Análise dos Materiais 
+*   Usar softwares como SolidWorks para simular:
+    *   Como as cerâmicas se comportam sob pressão ou calor (ex.: resistência ao quebrar).
+    *   Se a temperatura de queima (inferior a 850°C, como no estudo) afeta sua durabilidade.
+"""),
+    ("divider", ""),
+    ("markdown", """
+*   Recriação de Forno Experimental
+*   **Objetivo:** Testar o comportamento da argila local em diferentes temperaturas de queima.
+*   **Metodologia:**
+    *   Construir um forno em escala reduzida, considerando princípios de termodinâmica.
+    *   Testar temperaturas entre 700°C e 900°C.
+    *   Medir tempo de queima, taxa de resfriamento e resistência do material.
+
+*   **Aplicação:** Validar se a queima abaixo de 850°C produzia cerâmica resistente ou se era uma limitação técnica da época.
+"""),
+    ("divider", ""),
+    ("subheader", "Licenciatura em Engenharia Informática e de Computadores (LEIC)"),
+    ("markdown", """
+Como futuro profissional, destaco:
+
+*   **Análise rápida:** Usar IA para processar dados químicos e mineralógicos das cerâmicas de Santa Vitória de forma eficiente.  
+*   **Ligações:** Relacionar dados de vários sítios a alta velocidade, revelando redes de troca.  
+*   **Ferramentas:** Criar plataformas que tornem os resultados acessíveis a todos.  
+*   *(Nota:)* A informática potencia a arqueologia sem a substituir.
+"""),
+    ("divider", ""),
+    ("subheader", "Referência"),
+    ("markdown", "Marques, R.; Rodrigues, A.L.; Russo, D.; Gméling, K.; Valera, A.C.; Dias, M.I.; Prudêncio, M.I.; Basílio, A.C.; Fernandes, P.G.; Ruiz, F. Fingerprinting Ceramics from the Chalcolithic Santa Vitória Enclosure (SW Iberia). *Minerals* **2024**, *14*, 399. [https://doi.org/10.3390/min14040399](https://doi.org/10.3390/min14040399)"),
+    ("divider", ""),
+    ("caption", "Aplicação Streamlit desenvolvida para a disciplina de Património Cultural e Ciências, baseada no artigo fornecido e nos critérios de avaliação."),
+]
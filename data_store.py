@@ -0,0 +1,426 @@
+"""Columnar store for the site/ditch CSV exports.
+
+Each site folder (laid out like ``data/ditch1/``) is ingested into a
+directory of memory-mapped NumPy columns plus a JSON manifest. The app then
+opens the store lazily and only maps the columns and sections it displays.
+
+The manifest records every source CSV's path, mtime, size and content hash.
+``refresh_store`` re-stats the sources, re-parses only files whose content
+changed and rebuilds only the tables derived from them, so restarts and
+extra worker processes start from the warm on-disk store. Refreshes from
+several processes are serialized by an exclusive lock on ``store/.lock``,
+and old table directories are only deleted once the new manifest is in place.
+
+    python data_store.py ./data ./store
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from chemistry import chemistry_frame, flags_frame, limits_frame, parse_chemical_table
+from schema import compact
+
+try:
+    import fcntl
+except ImportError:  # Windows: byte-range locks from msvcrt instead
+    fcntl = None
+    import msvcrt
+
+DATA_PATH = Path("./data")
+STORE_PATH = Path("./store")
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = ".lock"
+FORMAT_VERSION = 4  # bump to force a full re-ingest after layout changes
+
+CHEMICAL_FILE = "chemical_contents.csv"
+REFERENCE_PATTERN = "reference_and_description_section_*.csv"
+MINERALOGY_PATTERN = "semi-quantitative_mineralogical_composition_section_*.csv"
+SECTION_RE = re.compile(r"_section_(\d+)\.csv$")
+TABLE_DIR_RE = re.compile(r"^\w+-[0-9a-f]{8}$")
+
+
+# --- CSV parsing (one source file at a time) ---
+def _section_from_name(path):
+    match = SECTION_RE.search(path.name)
+    return int(match.group(1)) if match else None
+
+
+def _parse_reference(path):
+    df = pd.read_csv(path)
+    if 'Section' not in df.columns:
+        df['Section'] = _section_from_name(path)
+    if 'Sample Reference' in df.columns:
+        df['Sample Reference'] = pd.to_numeric(df['Sample Reference'], errors='coerce')
+        df.dropna(subset=['Sample Reference'], inplace=True)
+        df['Sample Reference'] = df['Sample Reference'].astype(int)
+    return {'reference': df.reset_index(drop=True)}
+
+
+def _parse_mineralogy(path):
+    df = pd.read_csv(path)
+    if 'Section' not in df.columns:
+        df['Section'] = _section_from_name(path)
+    return {'mineralogy': df}
+
+
+def _parse_chemistry(path):
+    # 'chemistry_flags' mirrors 'chemistry' with the censoring bits (n.d., <DL, '%'),
+    # 'chemistry_limits' with the detection limits of the '<DL' entries
+    chem = parse_chemical_table(path)
+    return {'chemistry': chemistry_frame(chem), 'chemistry_flags': flags_frame(chem),
+            'chemistry_limits': limits_frame(chem)}
+
+
+def _parser_for(path):
+    if path.name == CHEMICAL_FILE:
+        return _parse_chemistry
+    if path.match(REFERENCE_PATTERN):
+        return _parse_reference
+    if path.match(MINERALOGY_PATTERN):
+        return _parse_mineralogy
+    return None
+
+
+def read_site_tables(site_dir):
+    """Parses one site folder into its reference, mineralogy and chemistry tables."""
+    parts = {}
+    for path in sorted(Path(site_dir).glob("*.csv")):
+        parser = _parser_for(path)
+        for name, df in (parser(path) if parser else {}).items():
+            parts.setdefault(name, []).append(df)
+    return {name: pd.concat(frames, ignore_index=True) for name, frames in parts.items()}
+
+
+def find_sites(data_root):
+    """Returns {site key: folder} for every folder holding the expected CSVs.
+
+    The key is the folder path relative to ``data_root`` (e.g. 'ditch1' or
+    'santa_vitoria/ditch2'), so nested site/ditch trees are supported.
+    """
+    data_root = Path(data_root)
+    sites = {}
+    for path in sorted(data_root.rglob("*.csv")):
+        if _parser_for(path) is not None:
+            folder = path.parent
+            sites[folder.relative_to(data_root).as_posix()] = folder
+    return sites
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _combine_hashes(hashes):
+    return hashlib.sha256("".join(hashes).encode()).hexdigest()[:16]
+
+
+# --- Writing ---
+def _write_table(df, table_dir):
+    """Writes each column as its own .npy file; strings are dictionary-encoded.
+
+    Categorical columns keep their categories (read back as categoricals);
+    other strings are read back as plain object columns.
+    """
+    table_dir.mkdir(parents=True, exist_ok=True)
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        filename = f"c{i:03d}.npy"
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            np.save(table_dir / filename, series.cat.codes.to_numpy())
+            columns.append({"name": str(name), "file": filename, "dtype": "category",
+                            "categories": series.cat.categories.tolist()})
+        elif pd.api.types.is_numeric_dtype(series):
+            np.save(table_dir / filename, series.to_numpy())
+            columns.append({"name": str(name), "file": filename, "dtype": str(series.dtype)})
+        else:
+            codes, categories = pd.factorize(series.astype(object), use_na_sentinel=True)
+            np.save(table_dir / filename, codes.astype(np.int32))
+            columns.append({"name": str(name), "file": filename, "dtype": "string",
+                            "categories": [str(c) for c in categories]})
+    return {"rows": len(df), "columns": columns}
+
+
+def _read_table(store_root, site, meta, columns=None, sections=None):
+    """Reads a written table back; shared by DataStore and the incremental refresh."""
+    table_dir = Path(store_root) / site / meta["dir"]
+    metas = {c["name"]: c for c in meta["columns"]}
+    wanted = list(metas) if columns is None else [c for c in columns if c in metas]
+
+    def column(col, rows=slice(None)):
+        values = np.asarray(np.load(table_dir / col["file"], mmap_mode='r')[rows])
+        if col["dtype"] == "category":
+            return pd.Categorical.from_codes(values, categories=col["categories"])
+        if col["dtype"] == "string":
+            categories = np.asarray(col["categories"] + [np.nan], dtype=object)
+            return categories[values]  # code -1 picks the trailing NaN
+        return values
+
+    rows = slice(None)
+    if sections is not None and 'Section' in metas:
+        rows = np.flatnonzero(np.isin(column(metas['Section']), list(sections)))
+
+    data = {name: column(metas[name], rows) for name in wanted}
+    return pd.DataFrame(data, columns=wanted)
+
+
+def _write_versioned(df, store_root, site, name):
+    """Writes a table into a fresh directory so readers of the old one are never disturbed."""
+    rel_dir = f"{name}-{uuid.uuid4().hex[:8]}"
+    meta = _write_table(df, Path(store_root) / site / rel_dir)
+    meta["dir"] = rel_dir
+    return meta
+
+
+def refresh_site(site_dir, store_root, site_key, previous=None):
+    """Brings one site's store entry up to date with its CSV folder.
+
+    Files whose mtime and size are unchanged are not even read. Files whose
+    content hash changed (or that are new) are re-parsed into per-file parts,
+    and only the tables built from those parts are concatenated again.
+    Returns the new manifest entry.
+    """
+    site_dir = Path(site_dir)
+    previous = previous or {"files": {}, "tables": {}}
+    files, changed_tables = {}, set()
+
+    for path in sorted(site_dir.glob("*.csv")):
+        parser = _parser_for(path)
+        if parser is None:
+            continue
+        stat = path.stat()
+        old = previous["files"].get(path.name)
+        if old and not _dirs_exist(store_root, site_key, old["parts"].values()):
+            old = None  # parts lost (e.g. an interrupted cleanup): parse the file again
+        if old and old["mtime_ns"] == stat.st_mtime_ns and old["size"] == stat.st_size:
+            files[path.name] = old
+            continue
+
+        sha256 = _sha256(path)
+        if old and old["sha256"] == sha256:
+            files[path.name] = dict(old, mtime_ns=stat.st_mtime_ns, size=stat.st_size)  # touched only
+            continue
+
+        parts = {name: _write_versioned(compact(df, name), store_root, site_key, f"parts/{path.stem}/{name}")
+                 for name, df in parser(path).items()}
+        files[path.name] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": sha256, "parts": parts}
+        changed_tables.update(parts)
+        if old:
+            changed_tables.update(old["parts"])
+
+    for name in set(previous["files"]) - set(files):  # deleted sources
+        changed_tables.update(previous["files"][name]["parts"])
+
+    # Derived tables: concatenation of the parts of every source that feeds them
+    tables = {}
+    for name in sorted({t for f in files.values() for t in f["parts"]}):
+        depends = [fname for fname in sorted(files) if name in files[fname]["parts"]]
+        old_table = previous["tables"].get(name)
+        if (name not in changed_tables and old_table and old_table["depends"] == depends
+                and _dirs_exist(store_root, site_key, [old_table])):
+            tables[name] = old_table
+            continue
+        frames = [_read_table(store_root, site_key, files[fname]["parts"][name]) for fname in depends]
+        # Parts carry their own categories, so the schema is applied again after concatenating
+        df = compact(pd.concat(frames, ignore_index=True), name)
+        tables[name] = _write_versioned(df, store_root, site_key, name)
+        tables[name]["depends"] = depends
+
+    entry = {
+        "source": site_dir.as_posix(),
+        # The format is part of the version, so caches keyed on it drop frames of an older layout
+        "version": _combine_hashes([str(FORMAT_VERSION)] + [files[fname]["sha256"] for fname in sorted(files)]),
+        "files": files,
+        "tables": tables,
+    }
+    return entry
+
+
+def _dirs_exist(store_root, site, metas):
+    return all((Path(store_root) / site / meta["dir"]).is_dir() for meta in metas)
+
+
+def _remove_unreferenced(site_store, entry):
+    """Deletes table directories no longer named by the manifest entry."""
+    keep = {t["dir"] for t in entry["tables"].values()}
+    keep |= {p["dir"] for f in entry["files"].values() for p in f["parts"].values()}
+    if not site_store.exists():
+        return
+    # Only look at this site's own table directories, not at nested site folders
+    owned = [p for p in site_store.iterdir() if p.name == "parts" or TABLE_DIR_RE.match(p.name)]
+    stale = [npy.parent for d in owned for npy in d.rglob("c000.npy")
+             if npy.parent.relative_to(site_store).as_posix() not in keep]
+    for table_dir in stale:
+        shutil.rmtree(table_dir, ignore_errors=True)
+
+
+def _load_manifest(store_root):
+    path = Path(store_root) / MANIFEST_NAME
+    if not path.exists():
+        return None
+    manifest = json.loads(path.read_text(encoding="utf-8"))
+    return manifest if manifest.get("format") == FORMAT_VERSION else None
+
+
+def _write_manifest(store_root, manifest):
+    path = Path(store_root) / MANIFEST_NAME
+    tmp = path.with_name(f"{MANIFEST_NAME}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(manifest, indent=1, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(path)  # atomic, so concurrent readers see the old or the new manifest
+
+
+@contextmanager
+def _store_lock(store_root):
+    """Exclusive lock held by one writer (refresh, manifest write, cleanup) at a time."""
+    store_root = Path(store_root)
+    store_root.mkdir(parents=True, exist_ok=True)
+    with open(store_root / LOCK_NAME, "a") as lock_file:
+        _lock(lock_file)
+        try:
+            yield
+        finally:
+            _unlock(lock_file)
+
+
+def _lock(lock_file):
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return
+    # msvcrt locks the first byte; LK_LOCK gives up after ~10 s, so keep waiting
+    lock_file.seek(0)
+    while True:
+        try:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            time.sleep(0.1)
+
+
+def _unlock(lock_file):
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+    else:
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _refresh_locked(data_root, store_root):
+    # The previous manifest is read under the lock, so it is always the latest one written
+    previous = _load_manifest(store_root) or {"sites": {}}
+    sites = {key: refresh_site(folder, store_root, key, previous["sites"].get(key))
+             for key, folder in find_sites(data_root).items()}
+    manifest = {
+        "format": FORMAT_VERSION,
+        "version": _combine_hashes(sites[key]["version"] for key in sorted(sites)),
+        "sites": sites,
+    }
+    if manifest != previous:
+        _write_manifest(store_root, manifest)
+        # Only now are the directories of the previous manifest unreferenced
+        for key in set(previous["sites"]) | set(sites):
+            _remove_unreferenced(store_root / key, sites.get(key, {"files": {}, "tables": {}}))
+    return manifest
+
+
+def refresh_store(data_root=DATA_PATH, store_root=STORE_PATH):
+    """Incrementally syncs the store with ``data_root`` and returns the manifest.
+
+    Cheap when nothing changed: every source is only stat-ed, the table
+    directories are checked to exist and the manifest is not rewritten.
+    """
+    store_root = Path(store_root)
+    with _store_lock(store_root):
+        return _refresh_locked(data_root, store_root)
+
+
+def ingest_tree(data_root=DATA_PATH, store_root=STORE_PATH):
+    """Rebuilds the store for every site under ``data_root`` from scratch."""
+    store_root = Path(store_root)
+    with _store_lock(store_root):
+        for key in find_sites(data_root):
+            shutil.rmtree(store_root / key, ignore_errors=True)
+        (store_root / MANIFEST_NAME).unlink(missing_ok=True)
+        return _refresh_locked(data_root, store_root)
+
+
+# --- Reading ---
+class DataStore:
+    """Read-only, lazily mapped view over an ingested store."""
+
+    def __init__(self, root=STORE_PATH):
+        self.root = Path(root)
+        self.manifest = json.loads((self.root / MANIFEST_NAME).read_text(encoding="utf-8"))
+
+    @property
+    def version(self):
+        return self.manifest["version"]
+
+    def sites(self):
+        return list(self.manifest["sites"])
+
+    def site_version(self, site):
+        return self.manifest["sites"][site]["version"]
+
+    def tables(self, site):
+        return list(self.manifest["sites"][site]["tables"])
+
+    def columns(self, site, table):
+        return [c["name"] for c in self._table(site, table)["columns"]]
+
+    def _table(self, site, table):
+        try:
+            return self.manifest["sites"][site]["tables"][table]
+        except KeyError:
+            raise FileNotFoundError(f"Table '{table}' for site '{site}' not found in store '{self.root}'") from None
+
+    def read(self, site, table, columns=None, sections=None):
+        """Reads ``columns`` of one table, optionally keeping only some sections.
+
+        Only the requested column files are mapped; rows are filtered on the
+        'Section' column before anything is copied into the DataFrame.
+        """
+        return _read_table(self.root, site, self._table(site, table), columns, sections)
+
+
+def load_site_frames(store, site):
+    """The per-sample frames the app shows: reference and chemistry.
+
+    Mineralogy is read through ``mineralogy.long_frame``, which spans sections and sites.
+    """
+    if site not in store.sites():
+        raise FileNotFoundError(f"site '{site}' is not in the data store")
+    # Only map the columns the app actually shows
+    df_ref = store.read(site, "reference", columns=['Sample Reference', 'SU', 'Section', 'Type', 'Sub-Type'])
+    df_chem = store.read(site, "chemistry")
+    return df_ref, df_chem
+
+
+def open_store(store_root=STORE_PATH, data_root=DATA_PATH, refresh=True):
+    """Opens the store, first syncing it with ``data_root`` unless ``refresh`` is False."""
+    store_root = Path(store_root)
+    if refresh or _load_manifest(store_root) is None:
+        refresh_store(data_root, store_root)
+    return DataStore(store_root)
+
+
+if __name__ == "__main__":
+    data_root = Path(sys.argv[1]) if len(sys.argv) > 1 else DATA_PATH
+    store_root = Path(sys.argv[2]) if len(sys.argv) > 2 else STORE_PATH
+    manifest = refresh_store(data_root, store_root)
+    for key, entry in manifest["sites"].items():
+        counts = ", ".join(f"{name}={t['rows']}" for name, t in entry["tables"].items())
+        print(f"{key}: {counts}")
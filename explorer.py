@@ -0,0 +1,105 @@
+"""Indexed, paginated access to the per-sample reference and chemistry rows.
+
+``build_sample_index`` joins a site's reference and chemistry tables once
+and precomputes, per categorical column (Section, SU, Type, Sub-Type), the
+sorted row positions of every value, plus one sort order per column.
+``query`` then answers combined filters by intersecting those position
+lists, applies element range filters only to the surviving rows, and
+returns a single sorted page, so only the visible rows are ever copied
+or sent to the browser.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+INDEXED_COLUMNS = ['Section', 'SU', 'Type', 'Sub-Type']
+REFERENCE_COLUMNS = ['Sample', 'SU', 'Section', 'Type', 'Sub-Type']
+
+SampleIndex = namedtuple("SampleIndex", "frame postings orders elements")
+
+
+def _postings(values):
+    """{value: sorted row positions} for one column, from a single stable argsort."""
+    codes, uniques = pd.factorize(values, sort=True, use_na_sentinel=True)
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    return {value: order[bounds[k]:bounds[k + 1]] for k, value in enumerate(uniques)}
+
+
+def _sort_order(values):
+    """Row positions in ascending order, missing values last."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Sorted categories -> codes sort like the values; missing (-1) goes past the last code.
+        # Casting back to the categories' dtype fails on NaN (e.g. int SU of unmatched samples)
+        if not values.cat.categories.is_monotonic_increasing:
+            values = values.cat.reorder_categories(values.cat.categories.sort_values())
+        codes = values.cat.codes.to_numpy(dtype=np.int64)
+        codes[codes < 0] = len(values.cat.categories)
+        return np.argsort(codes, kind='stable')
+    return np.asarray(values.argsort(kind='stable'))
+
+
+def build_sample_index(df_ref, df_chem):
+    """Joins reference and chemistry rows on the sample id and indexes them."""
+    frames = []
+    if df_ref is not None:
+        frames.append(df_ref.rename(columns={'Sample Reference': 'Sample'}))
+    if df_chem is not None:
+        frames.append(df_chem)
+    frame = frames[0]
+    for other in frames[1:]:
+        frame = frame.merge(other, on='Sample', how='outer')
+    frame = frame.sort_values('Sample', kind='stable').reset_index(drop=True)
+
+    elements = [c for c in (df_chem.columns if df_chem is not None else []) if c != 'Sample']
+    postings = {col: _postings(frame[col]) for col in INDEXED_COLUMNS if col in frame.columns}
+    orders = {col: _sort_order(frame[col]) for col in frame.columns}
+    return SampleIndex(frame, postings, orders, elements)
+
+
+def _union(index, column, values):
+    lists = [index.postings[column].get(v, np.empty(0, dtype=np.intp)) for v in values]
+    return np.unique(np.concatenate(lists)) if lists else np.empty(0, dtype=np.intp)
+
+
+def query(index, filters=None, ranges=None, sort_by=None, ascending=True, page=0, page_size=50, columns=None):
+    """One page of matching rows and the total number of matches.
+
+    ``filters`` maps indexed columns to accepted values (OR within a column,
+    AND across columns); ``ranges`` maps numeric columns to inclusive
+    ``(low, high)`` bounds. Missing values sort last in either direction.
+    """
+    n_rows = len(index.frame)
+    rows = None
+    for column, values in (filters or {}).items():
+        if column not in index.postings or not values:
+            continue
+        matches = _union(index, column, values)
+        rows = matches if rows is None else np.intersect1d(rows, matches, assume_unique=True)
+    if rows is None:
+        rows = np.arange(n_rows)
+
+    for column, (low, high) in (ranges or {}).items():
+        values = index.frame[column].to_numpy(dtype=np.float64)[rows]
+        rows = rows[(values >= low) & (values <= high)]
+
+    if sort_by is not None and sort_by in index.orders:
+        order = index.orders[sort_by]
+        if not ascending:
+            present = index.frame[sort_by].notna().to_numpy()[order]
+            order = np.concatenate([order[present][::-1], order[~present]])
+        selected = np.zeros(n_rows, dtype=bool)
+        selected[rows] = True
+        rows = order[selected[order]]
+
+    start = page * page_size
+    page_rows = rows[start:start + page_size]
+    frame = index.frame if columns is None else index.frame[[c for c in columns if c in index.frame.columns]]
+    return frame.iloc[page_rows].reset_index(drop=True), len(rows)
+
+
+def value_range(index, column):
+    """(min, max) of a numeric column, ignoring missing values; None if all missing."""
+    values = index.frame[column].dropna()
+    return (float(values.min()), float(values.max())) if len(values) else None
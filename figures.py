@@ -0,0 +1,134 @@
+"""Figures shown in section 3.
+
+Each matplotlib function only draws and returns the Figure; callers either
+hand it to ``rendering.FigureCache.render`` (the app) or save it directly
+(batch reports). Figures are plain ``matplotlib.figure.Figure`` objects,
+not pyplot ones: pyplot's global figure registry is not thread-safe, and
+sessions rerun in parallel threads. Nothing needs closing afterwards. The PCA biplot is an Altair chart, so it stays zoomable
+in the browser. Nothing here depends on Streamlit.
+"""
+import altair as alt
+import numpy as np
+from matplotlib.figure import Figure
+from scipy.cluster.hierarchy import dendrogram
+
+SECTION_COLORS = {1: 'blue', 2: 'red', 'Desconhecido': 'grey'}
+SECTION_MARKERS = {1: 'o', 2: 's', 'Desconhecido': '^'}
+
+
+def draw_figure5(df_plot, df_outliers, ref_element):
+    """Fe vs Na and K vs Na (normalized), one colour per sector, outliers labelled.
+
+    ``df_plot`` holds 'Sample', 'Section', 'Na_norm', 'Fe_norm' and 'K_norm'.
+    """
+    fig = Figure(figsize=(12, 5))
+    ax1, ax2 = fig.subplots(1, 2)
+    panels = [(ax1, 'Fe_norm', 'Fe₂O₃', 'Fe vs Na (Normalizado)'), (ax2, 'K_norm', 'K₂O', 'K vs Na (Normalizado)')]
+
+    for ax, y_col, y_element, title in panels:
+        for section in df_plot['Section'].unique():
+            group = df_plot[df_plot['Section'] == section]
+            label_txt = f'Sector {section}' if section != 'Desconhecido' else 'Sector Desconhecido'
+            ax.scatter(group['Na_norm'], group[y_col],
+                       label=label_txt,
+                       color=SECTION_COLORS.get(section, 'black'), marker=SECTION_MARKERS.get(section, 'x'), alpha=0.7)
+        for x, y, sample in zip(df_outliers['Na_norm'], df_outliers[y_col], df_outliers['Sample']):
+            ax.text(x * 1.01, y * 1.01, str(int(sample)))
+        ax.set_xlabel(f'Na₂O / {ref_element}') # Match exact element name
+        ax.set_ylabel(f'{y_element} / {ref_element}')
+        ax.set_title(title)
+        ax.legend()
+        ax.grid(True, linestyle='--', alpha=0.6)
+
+    fig.tight_layout()
+    return fig
+
+
+def draw_dendrogram(cluster_tree, n_clusters):
+    """Dendrogram of a ``clustering.ClusterTree`` coloured at the ``n_clusters`` cut."""
+    fig = Figure(figsize=(12, 4))
+    ax = fig.subplots()
+    n_leaves = len(cluster_tree.leaves)
+    leaf_names = [str(s) for s in cluster_tree.samples] if n_leaves == len(cluster_tree.samples) else None
+    # Colour threshold just below the merge that would join the last two of n_clusters groups
+    threshold = cluster_tree.linkage[-(n_clusters - 1), 2] if n_clusters > 1 else None
+    dendrogram(
+        cluster_tree.linkage, ax=ax, labels=leaf_names, color_threshold=threshold,
+        truncate_mode='lastp' if n_leaves > 60 else None, p=60, leaf_font_size=9
+    )
+    ax.set_ylabel('Distância (Ward)')
+    ax.set_title(f'Dendrograma ({len(cluster_tree.features)} elementos)')
+    return fig
+
+
+def draw_correlation(df_corr, max_count):
+    """Pearson correlation heatmap; ``max_count`` is the largest pairwise sample count."""
+    fig = Figure(figsize=(10, 8))
+    ax = fig.subplots()
+    im = ax.imshow(df_corr.to_numpy(), cmap='RdBu_r', vmin=-1, vmax=1)
+    ax.set_xticks(range(len(df_corr.columns)), df_corr.columns, rotation=90)
+    ax.set_yticks(range(len(df_corr.index)), df_corr.index)
+    fig.colorbar(im, ax=ax, label='r de Pearson')
+    ax.set_title(f'Correlação de Pearson (n máx. = {max_count} amostras)')
+    fig.tight_layout()
+    return fig
+
+
+def draw_ternary(df_density, minerals):
+    """Ternary density of three minerals; one colour per group, marker area ~ sample count.
+
+    ``df_density`` comes from ``mineralogy.ternary_density`` (fractions per cell).
+    """
+    a, b, c = minerals
+    fig = Figure(figsize=(7, 6))
+    ax = fig.subplots()
+    h = np.sqrt(3) / 2
+    ax.plot([0, 1, 0.5, 0], [0, 0, h, 0], color='black', linewidth=1)
+    for t in np.linspace(0.2, 0.8, 4):  # 20% grid lines parallel to each side
+        ax.plot([t / 2, 1 - t / 2], [t * h, t * h], color='grey', linewidth=0.4, linestyle='--')
+        ax.plot([t, t / 2], [0, t * h], color='grey', linewidth=0.4, linestyle='--')
+        ax.plot([t, (1 + t) / 2], [0, (1 - t) * h], color='grey', linewidth=0.4, linestyle='--')
+
+    # Vertices: a bottom-left, b bottom-right, c top
+    max_count = max(int(df_density['count'].max()), 1) if len(df_density) else 1
+    for k, (group, cells) in enumerate(df_density.groupby('Group', sort=False)):
+        x = cells[b] + cells[c] / 2
+        y = cells[c] * h
+        ax.scatter(x, y, s=20 + 280 * cells['count'] / max_count, alpha=0.5, label=group, color=f'C{k}')
+
+    ax.text(-0.03, -0.04, a, ha='right', va='top')
+    ax.text(1.03, -0.04, b, ha='left', va='top')
+    ax.text(0.5, h + 0.03, c, ha='center', va='bottom')
+    ax.set_xlim(-0.15, 1.15)
+    ax.set_ylim(-0.1, h + 0.1)
+    ax.set_aspect('equal')
+    ax.axis('off')
+    ax.set_title(f'Diagrama ternário (n máx. por célula = {max_count})')
+    ax.legend(loc='upper right')
+    return fig
+
+
+def biplot_chart(df_scores, df_loadings, x, y, color, df_new=None):
+    """Interactive PCA biplot: sample scores coloured by ``color`` and element loading arrows.
+
+    Loadings are rescaled to 80% of the score range so both fit one frame;
+    ``df_new`` (projected samples) is drawn as black crosses.
+    """
+    extent = max(float(df_scores[[x, y]].abs().to_numpy().max()), 1e-9)
+    scale = 0.8 * extent / max(float(df_loadings[[x, y]].abs().to_numpy().max()), 1e-9)
+    arrows = df_loadings.assign(x0=0.0, y0=0.0, x1=df_loadings[x] * scale, y1=df_loadings[y] * scale)
+
+    points = alt.Chart(df_scores).mark_circle(size=40, opacity=0.7).encode(
+        x=alt.X(f'{x}:Q'), y=alt.Y(f'{y}:Q'), color=alt.Color(f'{color}:N'),
+        tooltip=['Sample', color, alt.Tooltip(f'{x}:Q', format='.2f'), alt.Tooltip(f'{y}:Q', format='.2f')],
+    ).interactive()
+    rules = alt.Chart(arrows).mark_rule(color='grey').encode(x='x0:Q', y='y0:Q', x2='x1:Q', y2='y1:Q')
+    labels = alt.Chart(arrows).mark_text(color='dimgrey', fontSize=11, dx=4, dy=-4, align='left').encode(
+        x='x1:Q', y='y1:Q', text='Element:N'
+    )
+    layers = [points, rules, labels]
+    if df_new is not None and len(df_new):
+        layers.append(alt.Chart(df_new).mark_point(shape='cross', color='black', size=120, filled=True).encode(
+            x=f'{x}:Q', y=f'{y}:Q', tooltip=['Sample', alt.Tooltip(f'{x}:Q', format='.2f'), alt.Tooltip(f'{y}:Q', format='.2f')]
+        ))
+    return alt.layer(*layers).properties(height=500)
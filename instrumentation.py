@@ -0,0 +1,136 @@
+"""Optional per-stage timing and memory profiling of an app rerun.
+
+Off by default. When enabled, ``Profiler.stage(name)`` records wall time
+and the traced (tracemalloc) memory peak of each stage, nested stages
+included, and appends every record to a JSON-lines file for offline
+aggregation. When disabled ``stage`` is a no-op context manager.
+
+Profiling is switched on by ``CERAMICS_PROFILE``: "1" profiles every rerun,
+"query" only reruns whose URL asks for it (``?profile=1``); unset, the query
+parameter is ignored, so visitors cannot turn tracing on for the process.
+
+Memory peaks are process-wide: allocations made by other sessions running
+at the same time are counted too, so compare them across quiet reruns.
+tracemalloc runs only while at least one profiler is open (``close`` at the
+end of the rerun, or when the profiler is garbage collected).
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+import weakref
+from pathlib import Path
+
+PROFILE_ENV = "CERAMICS_PROFILE"
+PROFILE_LOG_ENV = "CERAMICS_PROFILE_LOG"
+DEFAULT_LOG_PATH = Path("./profile/stages.jsonl")
+
+_log_lock = threading.Lock()
+_tracing_lock = threading.Lock()
+_tracing = {"users": 0, "started": False}  # open profilers, and whether they started tracemalloc
+
+
+def env_enabled():
+    return os.environ.get(PROFILE_ENV, "").lower() in ("1", "true", "yes", "on")
+
+
+def query_allowed():
+    """True if ``?profile=1`` may enable profiling (``CERAMICS_PROFILE`` is on or 'query')."""
+    return env_enabled() or os.environ.get(PROFILE_ENV, "").lower() == "query"
+
+
+def log_path():
+    return Path(os.environ.get(PROFILE_LOG_ENV) or DEFAULT_LOG_PATH)
+
+
+def _acquire_tracing():
+    with _tracing_lock:
+        if _tracing["users"] == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing["started"] = True
+        _tracing["users"] += 1
+
+
+def _release_tracing():
+    with _tracing_lock:
+        _tracing["users"] -= 1
+        # Only stop tracing this module started (not e.g. python -X tracemalloc)
+        if _tracing["users"] == 0 and _tracing["started"]:
+            tracemalloc.stop()
+            _tracing["started"] = False
+
+
+def append_records(path, records):
+    """Appends records to a JSON-lines file (safe across session threads)."""
+    path = Path(path)
+    with _log_lock:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class Profiler:
+    """Collects one record per stage of a single rerun."""
+
+    def __init__(self, enabled=False, log_file=None, **context):
+        self.enabled = enabled
+        self.log_file = log_file
+        self.context = context
+        self.run_id = uuid.uuid4().hex[:12]
+        self.records = []
+        self._t0 = time.perf_counter()
+        self._stack = []  # [start traced bytes, highest peak seen so far] per open stage
+        self._finalizer = None
+        if enabled:
+            _acquire_tracing()
+            self._finalizer = weakref.finalize(self, _release_tracing)
+
+    @property
+    def closed(self):
+        return self._finalizer is None or not self._finalizer.alive
+
+    def close(self):
+        """Ends the rerun's profiling; stops tracemalloc once no other profiler needs it."""
+        if self._finalizer is not None:
+            self._finalizer()  # runs at most once, also on garbage collection
+
+    def stage(self, name):
+        if not self.enabled or self.closed:
+            return contextlib.nullcontext()
+        return self._stage(name)
+
+    @contextlib.contextmanager
+    def _stage(self, name):
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stack:
+            self._stack[-1][1] = max(self._stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        frame = [current, current]
+        self._stack.append(frame)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            self._stack.pop()
+            peak = max(frame[1], tracemalloc.get_traced_memory()[1])
+            if self._stack:
+                # The parent's peak includes everything its children allocated
+                self._stack[-1][1] = max(self._stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            record = {
+                "run": self.run_id, "time": round(time.time(), 3), "stage": name,
+                "depth": len(self._stack), "offset": round(started - self._t0, 6), "seconds": round(seconds, 6),
+                "peak_kib": round((peak - frame[0]) / 1024, 1), **self.context,
+            }
+            self.records.append(record)
+            if self.log_file is not None:
+                append_records(self.log_file, [record])
+
+    def summary(self):
+        """Records in start order (parents before children), for display."""
+        return sorted(self.records, key=lambda r: r["offset"])
@@ -1,85 +1,197 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
 import base64 # Import base64
+import json
 from pathlib import Path # To read image file
+import content
+from chemistry import DERIVED_COLUMNS, chemistry_frame, parse_chemical_table, pearson_pairwise, ratio_matrix
+from clustering import N_CLUSTERS, cached_tree, cut_tree, feature_matrix
+from data_store import DATA_PATH, STORE_PATH, load_site_frames, open_store, refresh_store
+from explorer import REFERENCE_COLUMNS, build_sample_index, query, value_range
+from figures import biplot_chart, draw_correlation, draw_dendrogram, draw_figure5, draw_ternary
+from instrumentation import Profiler, env_enabled, log_path, query_allowed
+from mineralogy import TERNARY_MINERALS, drill_down, group_means, group_quantiles, histograms, long_frame, ternary_density
+from outliers import NORM_COLUMNS, figure5_frame
+from pca import cached_pca, loadings, missing_features, project
+from provenance import cached_index, feature_coverage, min_features, nearest_references
+from rendering import FigureCache, content_key
 
 # --- Page Configuration ---
 st.set_page_config(
-    page_title="Cerâmicas Calcolíticas: Santa Vitória",
+    page_title=content.PAGE_TITLE,
     page_icon=":test_tube:",
     layout="wide"
 )
 
+MAX_DRILL_DOWN_ROWS = 500 # Sample rows sent per mineralogy drill-down
+EXPLORER_PAGE_SIZES = [25, 50, 100, 250]
+MAX_BIPLOT_POINTS = 5000 # Scores sent to the browser for the PCA biplot
+EXPLORER_LABELS = {'Section': "Sector", 'SU': "UE (SU)", 'Type': "Tipo", 'Sub-Type': "Subtipo"}
+
+# --- Optional profiling (CERAMICS_PROFILE=1, or CERAMICS_PROFILE=query and ?profile=1) ---
+# Stage records go to the sidebar panel and are appended to a JSON-lines log
+profiler = Profiler(enabled=env_enabled() or (query_allowed() and st.query_params.get("profile") == "1"), log_file=log_path())
+
 # --- Data Loading ---
-@st.cache_data # Cache data loading for performance
-def load_data():
+@st.cache_data(persist="disk") # Cached in memory and on disk, so restarts start warm
+def read_site_data(site="ditch1", site_version=None):
+    # site_version (hash of the site's CSV contents) is only part of the cache key,
+    # so editing a CSV under data/<site>/ invalidates exactly that site's entries.
+    # Errors are raised, not returned: st.cache_data never stores a raised call
+    store = open_store(STORE_PATH, DATA_PATH, refresh=False)
+    return load_site_frames(store, site)
+
+def load_data(site="ditch1", site_version=None):
     try:
-        # Adjust paths if your data folder structure is different
-        base_path = "./data/ditch1/"
-        df_ref_s1 = pd.read_csv(base_path + "reference_and_description_section_1.csv")
-        df_ref_s2 = pd.read_csv(base_path + "reference_and_description_section_2.csv")
-        df_min_s1 = pd.read_csv(base_path + "semi-quantitative_mineralogical_composition_section_1.csv")
-        df_min_s2 = pd.read_csv(base_path + "semi-quantitative_mineralogical_composition_section_2.csv")
-
-        # --- Corrected Loading for Chemical Data ---
-        # Read the chemical data, recognizing 'Element' is the key column
-        df_chem_raw = pd.read_csv(base_path + "chemical_contents.csv")
-
-        # 1. Set 'Element' as the index
-        df_chem_indexed = df_chem_raw.set_index('Element')
-
-        # 2. Transpose the DataFrame: Samples become rows, Elements become columns
-        df_chem_transposed = df_chem_indexed.T
-
-        # 3. Reset the index: The Sample numbers (now in the index) become a column
-        df_chem_transposed.index.name = 'Sample' # Name the index before resetting
-        df_chem = df_chem_transposed.reset_index()
-
-        # 4. Convert 'Sample' column to integer
-        df_chem['Sample'] = pd.to_numeric(df_chem['Sample'], errors='coerce')
-        df_chem.dropna(subset=['Sample'], inplace=True) # Remove if sample couldn't be converted
-        df_chem['Sample'] = df_chem['Sample'].astype(int)
-
-        # 5. Convert element columns to numeric, replacing 'n.d.' (and potentially '%') with NaN
-        element_cols = df_chem.columns.drop('Sample') # Get all columns except 'Sample'
-        for col in element_cols:
-            # Handle potential '%' signs (like in CaO '3.9%') before conversion
-            if df_chem[col].dtype == 'object': # Only process object (string) columns
-                 df_chem[col] = df_chem[col].astype(str).str.replace('%', '', regex=False)
-            # Replace 'n.d.' with NaN and convert to numeric
-            df_chem[col] = pd.to_numeric(df_chem[col].replace(['n.d.', 'n.d'], np.nan, regex=False), errors='coerce')
-
-        # --- End of Corrected Loading ---
-
-
-        # Combine reference data
-        df_ref = pd.concat([df_ref_s1, df_ref_s2], ignore_index=True)
-
-        # Ensure key columns in df_ref are numeric for merging
-        if 'Sample Reference' in df_ref.columns:
-            df_ref['Sample Reference'] = pd.to_numeric(df_ref['Sample Reference'], errors='coerce')
-            df_ref.dropna(subset=['Sample Reference'], inplace=True)
-            df_ref['Sample Reference'] = df_ref['Sample Reference'].astype(int)
-        else:
-             st.warning("Reference data is missing 'Sample Reference' column. Merge might fail.")
+        df_ref, df_chem = read_site_data(site, site_version)
 
+        if 'Sample Reference' not in df_ref.columns:
+             st.warning("Reference data is missing 'Sample Reference' column. Merge might fail.")
 
-        return df_ref, df_min_s1, df_min_s2, df_chem # Return the *processed* df_chem
+        return df_ref, df_chem
 
     except FileNotFoundError as e:
-        st.error(f"Error loading data file: {e}. Make sure CSV files are in './data/ditch1/' directory or adjust paths.")
-        return None, None, None, None
+        st.error(f"Error loading data file: {e}. Make sure the CSV files are under './data/<site>/' and run `python data_store.py` to refresh the store.")
+        return None, None
     except Exception as e:
         st.error(f"An error occurred during data loading: {e}")
         # Include traceback for debugging if needed
         # import traceback
         # st.error(traceback.format_exc())
-        return None, None, None, None
+        return None, None
+
+@st.cache_data(ttl=10, show_spinner=False) # Re-stat the source CSVs at most every 10 s
+def sync_store():
+    # Only files whose mtime/size changed are hashed, and only changed ones re-parsed
+    return refresh_store(DATA_PATH, STORE_PATH)["version"]
+
+
+# --- Site selection (one store entry per site/ditch folder) ---
+sync_store()
+data_store = open_store(STORE_PATH, DATA_PATH, refresh=False)
+available_sites = data_store.sites()
+selected_site = st.sidebar.selectbox(
+    "Sítio / Fosso", available_sites,
+    index=available_sites.index("ditch1") if "ditch1" in available_sites else 0
+) if available_sites else "ditch1"
+site_version = data_store.site_version(selected_site) if selected_site in available_sites else None
+profiler.context["site"] = selected_site
+
+@st.cache_data # One ratio matrix per dataset version and reference element
+def load_ratios(site, site_version, reference="Sc", log=False):
+    df_chem = load_data(site, site_version)[1]
+    if df_chem is None or reference not in df_chem.columns:
+        return None
+    return ratio_matrix(df_chem, reference, log)
+
+
+@st.cache_data # Figure 5 frame and its per-sector outliers per data version and reference element
+def load_figure5(site, site_version, reference="Sc", _stage=None):
+    # _stage (a profiler hook) is not hashed, so it does not split the cache
+    df_ref, df_chem = load_data(site, site_version)
+    if df_chem is None:
+        return None, None
+    try:
+        return figure5_frame(df_chem, df_ref, reference, stage=_stage)
+    except KeyError:
+        return None, None
+
+
+@st.cache_data # Linkage per data version; cached_tree also keeps it on disk across restarts
+def load_cluster_tree(site, site_version, reference="Sc"):
+    df_log = load_ratios(site, site_version, reference, log=True)
+    if df_log is None or len(df_log) < 2:
+        return None
+    samples, X, features = feature_matrix(df_log)
+    cache_key = f"cluster-{site.replace('/', '_')}-{reference}"
+    return cached_tree(samples, X, features, STORE_PATH / "cache", cache_key)
+
+
+@st.cache_data # One correlation matrix per data version and (sections, types) subset
+def load_correlation(site, site_version, sections=(), types=()):
+    df_ref, df_chem = load_data(site, site_version)
+    if df_chem is None:
+        return None, None
+    if df_ref is not None and (sections or types):
+        subset = df_ref
+        if sections:
+            subset = subset[subset['Section'].isin(sections)]
+        if types:
+            subset = subset[subset['Type'].isin(types)]
+        df_chem = df_chem[df_chem['Sample'].isin(subset['Sample Reference'])]
+    elements = [col for col in df_chem.columns if col != 'Sample']
+    r, n = pearson_pairwise(df_chem[elements].to_numpy())
+    return pd.DataFrame(r, index=elements, columns=elements), n
+
+
+@st.cache_data # Long-format mineralogy of the chosen sites (Site, Section, Sample, Mineral, Percent)
+def load_mineralogy(store_version, sites):
+    return long_frame(open_store(STORE_PATH, DATA_PATH, refresh=False), sites)
 
-# --- Load data using the modified function ---
-df_reference, df_mineralogical_s1, df_mineralogical_s2, df_chemical = load_data()
+
+@st.cache_data # Per-group aggregates are all the overview tabs send to the browser
+def load_mineralogy_summary(store_version, sites):
+    df_long = load_mineralogy(store_version, sites)
+    if df_long.empty:
+        return None, None
+    return group_means(df_long), group_quantiles(df_long)
+
+
+@st.cache_data
+def load_mineral_histogram(store_version, sites, mineral, bin_width=5):
+    return histograms(load_mineralogy(store_version, sites), mineral, bin_width)
+
+
+@st.cache_data
+def load_ternary_density(store_version, sites, minerals, n_bins=10):
+    return ternary_density(load_mineralogy(store_version, sites), minerals, n_bins)
+
+
+@st.cache_data
+def load_mineral_samples(store_version, sites, group, mineral, low, high):
+    return drill_down(load_mineralogy(store_version, sites), group, mineral, low, high)
+
+
+@st.cache_resource # One sample index per site version, shared read-only by all sessions
+def load_sample_index(site, site_version):
+    df_ref, df_chem = load_data(site, site_version)
+    if df_ref is None and df_chem is None:
+        return None
+    return build_sample_index(df_ref, df_chem)
+
+
+@st.cache_resource # One clr-PCA model per data version (also kept on disk by data hash)
+def load_pca_model(site, site_version):
+    df_chem = load_data(site, site_version)[1]
+    if df_chem is None:
+        return None
+    try:
+        return cached_pca(df_chem, STORE_PATH / "cache", f"pca-{site.replace('/', '_')}")
+    except ValueError:
+        return None
+
+
+@st.cache_data # Scores of the site's samples with Section/Type for colouring
+def load_pca_scores(site, site_version):
+    df_ref, df_chem = load_data(site, site_version)
+    df_scores = project(load_pca_model(site, site_version), df_chem)
+    if df_ref is not None:
+        df_scores = df_scores.merge(df_ref[['Sample Reference', 'Section', 'Type']], left_on='Sample',
+                                    right_on='Sample Reference', how='left').drop(columns='Sample Reference')
+    return df_scores
+
+
+@st.cache_resource # One KD-tree per store version, shared by all sessions (also pickled on disk)
+def load_provenance_index(store_version, reference="Sc"):
+    try:
+        return cached_index(open_store(STORE_PATH, DATA_PATH, refresh=False), STORE_PATH / "cache", reference)
+    except ValueError:
+        return None
+
+
+@st.cache_resource # One bounded figure cache per server process, shared by all sessions
+def figure_cache():
+    return FigureCache(max_bytes=64 * 1024 * 1024, spill_dir=STORE_PATH / "cache" / "figures", max_spill_bytes=256 * 1024 * 1024)
 
 
 # --- App Header ---
@@ -95,11 +207,12 @@ def img_to_base64(img_path):
         return None
 
 # --- Cabeçalho da App (Método 2: HTML/Markdown) ---
-img_path = "ist_logo.webp"
-img_base64 = img_to_base64(img_path)
+img_path = content.LOGO_PATH
+with profiler.stage("img_to_base64"):
+    img_base64 = img_to_base64(img_path)
 
 # Adjust image width and margin as needed
-image_width_px = 200
+image_width_px = content.LOGO_WIDTH_PX
 right_margin_px = 20
 
 # if img_base64:
@@ -124,10 +237,10 @@ if img_base64:
             <img src="data:image/webp;base64,{img_base64}" width="{image_width_px}" style="margin: 0;">
             <div style="display: flex; flex-direction: column; justify-content: center;">
                 <h1 style="margin: 0; font-size: 40px; line-height: 1.2;">
-                    Património Cultural e Ciências: Caso de Estudo
+                    {content.TITLE}
                 </h1>
                 <h3 style="margin: 0 0 0 0; font-size: 22px; line-height: 1.2;">
-                    Fingerprinting Ceramics from the Chalcolithic Santa Vitória Enclosure (SW Iberia)
+                    {content.SUBTITLE}
                 </h3>
             </div>
         </div>
@@ -136,324 +249,339 @@ if img_base64:
     )
 else:
     # Fallback if image loading fails
-    st.title("Património Cultural e Ciências: Caso de Estudo")
-    st.subheader("Fingerprinting Ceramics from the Chalcolithic Santa Vitória Enclosure (SW Iberia)")
+    st.title(content.TITLE)
+    st.subheader(content.SUBTITLE)
 st.markdown("---")
-st.markdown("""
-*Apresenta-se um resumo e análise do artigo científico: "Marques, R. et al. (2024). Fingerprinting Ceramics from the Chalcolithic Santa Vitória Enclosure (SW Iberia). Minerals 14, 399." 
- Este trabalho foi realizado pelos elementos do grupo 5 constituído por Guilherme Prestes (LEMEC), Guilherme Amaro (LEMEC), Liedson Cunha (LEIC).
- [Link para o artigo](https://www.mdpi.com/2075-163X/14/4/399)*
-
-**Objetivo:** Introduzir o artigo científico e identificar os problemas abordados; analisar os resultados obtidos e as metodologias aplicadas; apresentar as conlcusões chegadas e as possíveis contribuições para o avanço do caso de estudo. 
-""")
+st.markdown(content.INTRO)
 
 # --- Main Content Sections ---
 
 # 1. Introduction & Context
-with st.expander("1. Introdução: Estudo realizado no Recinto Calcolítico de Santa Vitória"):
-    st.markdown("""
-    <h3 style="color:#388cb0;"><b>Património Estudado:</b></h3> 
-    O estudo foca em cerâmicas arqueológicas provenientes do recinto Calcolítico de Santa Vitória, 
-    situado em Campo Maior, no Alentejo, sul de Portugal. O recinto, caracterizado por dois fossos 
-    concêntricos de traçado sinuoso com lóbulos semicirculares contíguos, datada da segunda metade do 3.º 
-    milénio a.C. (Fosso 1: 2556-2040 cal AC; Fosso 2: 2460-2200 cal AC, segundo datações por radiocarbono). 
-    Classificado como de interesse público nacional, Santa Vitória é considerado um espaço cerimonial,
-    testemunho das práticas sociais, rituais e cosmológicas das comunidades pré-históricas da região.
-    
-    <ul>
-    <li><b style="color:#808b96; font-size:20px;">
-        Objetivo principal:</b> 
-        Contribuir para a contextualização dos artefactos cerâmicos, o que implica compreender  
-        as tecnologias de produção utilizadas e a origem das matérias-primas, entretanto, discutir o papel
-        do recinto no panorama regional.
-    </li>
-    <li><b style="color:#808b96; font-size:20px;">Amostras:</b> 
-    Foram estudados 25 fragmentos cerâmicos recolhidos em duas secções distintas do Fosso 1. Estes fragmentos 
-    incluem diferentes tipologias, como tigelas, contas (pequenos objetos que poderão ter sido utilizados como 
-    decoração) e fragmentos indiferenciados (peças cuja forma original é difícil de identificar).
-    </li>
-    </ul>
-    
-    <p style="color:Gray;"><i>(Ver Figuras 1 & 2 no artigo)</i></p>
-    
-    <h3 style="color:#388cb0;">Questões de Investigação Abordadas</h3>
-    
-    O artigo aborda as seguintes questões:
-    
-    <ol>
-    <li><b style="color:#808b96;">Procedência das cerâmicas:</b> As cerâmicas foram produzidas localmente ou terão sido importadas de outros locais? </li>
-    <li><b style="color:#808b96;">Técnicas de fabrico:</b> Que tecnologias foram usados na produção destas cerâmicas? </li>
-    <li><b style="color:#808b96;">Diferenças entre as seções do fosso:</b> Existem variações significativas na composição mineralógica e química das cerâmicas? </li>
-    <li><b style="color:#808b96;">Implicações sociais:</b> Que informações as cerâmicas fornecem sobre as dinâmicas sociais da comunidade? </li>
-    </ol>
-    """, unsafe_allow_html=True)
+with profiler.stage("section_1"), st.expander(content.SECTION_1_TITLE):
+    st.markdown(content.SECTION_1, unsafe_allow_html=True)
 
 # 2. Methodology
-with st.expander("2. Metodologia: Técnicas usadas para estudar as Cerâmicas"):
-    st.markdown("""
-    <h3 style="color:#388cb0;">Métodos de Análise</h3>
-    
-    Para determinar a proveniência das matérias-primas, assim como as tecnologias de produção 
-    e a diferença composicional entre os fragmentos, foram usados diferentes técnicas para 
-    determinar tanto os componentes químicos como mineralógicos presentes nos fragmentos. 
-    
-    <ul>
-    <li><b style="color:#808b96; font-size:20px;">1. Difração de Raios-X (XRD):</b> 
-        <ul>
-            <li>Identificar as fases minerais presentes nas cerâmicas, tais como: quartzo, plagioclásios, anfibólios, filossilicatos, feldspatos alcalinos e hematite.</li>
-            <li>A presença de filossilicatos e a ausência de minerais característicos de altas temperaturas apontam para uma queima das cerâmicas a temperaturas inferiores a 850°C.</li>
-        </ul>
-    </li>
-    
-    <li><b style="color:#808b96; font-size:20px;">2. Análise por Ativação Neutrônica (NAA):</b> 
-        <ul>
-            <li>Quantificar 24 elementos químicos, incluindo elementos maioritários (ex.: Na, K, Fe) e em traços (ex.: terras raras, Rb, Cs).</li>
-            <li>Normalização com escândio (Sc) para minimizar variações naturais e antrópicas.</li>
-        </ul>
-    </li>
-    
-    <li><b style="color:#808b96; font-size:20px;">3. Análises Estatísticas:</b> 
-        <ul>
-            <li><b>Clusterização hierárquica:</b> Agrupar amostras com composições químicas semelhantes.</li>
-            <li><b>Correlação de Pearson:</b> Avaliar relações entre elementos químicos.</li>
-        </ul>
-    </li>
-    </ul>
-    
-    <h3 style="color:#388cb0;">Resultados Principais</h3>
-    
-    <ul>
-    <li><b style="color:#808b96;">Proveniência local:</b> A composição mineralógica das cerâmicas, dominada por plagioclásios, anfibólios e quartzo, reflete o contexto geológico regional, caracterizado por gabros, dioritos e rochas híbridas da região.</li>
-    
-    <li><b style="color:#808b96;">Tecnologia de produção:</b> 
-        <ul>
-            <li>Temperatura de queima inferior a 850°C.</li>
-            <li>Uso de Temperantes: Adição de grãos não plásticos (temper) em proporções variáveis, com maior evidência na Secção 1, onde os fragmentos <br> apresentam uma textura mais grosseira devido ao tamanho superior dos grãos.</li>
-        </ul>
-    </li>
-    
-    <li><b style="color:#808b96;">Diferenças entre seções:</b> 
-        <ul>
-            <li><b>Seção 1:</b> Maior proporção de grãos grossos e menor teor de ferro.</li>
-            <li><b>Seção 2:</b> Maior heterogeneidade química e maior presença de anfibólios/ferro.</li>
-        </ul>
-    </li>
-    
-    <li><b style="color:#808b96;">Amostras atípicas:</b> 
-        <ul>
-            <li><b>Amostra 163:</b> Alto teor de potássio (K), associado a feldspatos alcalinos.</li>
-            <li><b>Amostra 183:</b> Alto teor de sódio (Na), ligado a plagioclásios.</li>
-        </ul>
-    </li>
-    </ul>
-    
-    <p style="color:Gray;"><i>(Ver Figuras 3 & 4 no artigo)</i></p>
-    """, unsafe_allow_html=True)
-
-# 3. Results
-with st.expander("3. Dados: Apresentação dos Resultados Obtidos"):
-    st.markdown("### 3.1 Informação das Amostras")
-    if df_reference is not None and 'Sample Reference' in df_reference.columns and 'Section' in df_reference.columns:
-        tab1, tab2 = st.tabs(["Amostras Sector 1 (n=10)", "Amostras Sector 2 (n=15)"])
-        with tab1:
-            st.dataframe(df_reference[df_reference['Section'] == 1][['Sample Reference', 'SU', 'Type', 'Sub-Type']].reset_index(drop=True))
-        with tab2:
-            st.dataframe(df_reference[df_reference['Section'] == 2][['Sample Reference', 'SU', 'Type', 'Sub-Type']].reset_index(drop=True))
+with profiler.stage("section_2"), st.expander(content.SECTION_2_TITLE):
+    st.markdown(content.SECTION_2, unsafe_allow_html=True)
+
+# --- Section 3 fragments ---
+# Each block reruns on its own when one of its widgets changes, and none of
+# them runs at all while the "3. Dados" expander is collapsed.
+@st.fragment
+def render_sample_explorer(key, columns=None, element_filters=False):
+    # Filters, sorting and paging run against the precomputed index on the server;
+    # only the visible page is sent to the browser
+    sample_index = load_sample_index(selected_site, site_version)
+    if sample_index is None:
+        st.warning("Não foi possível carregar os dados das amostras.")
+        return
+
+    filter_columns = st.columns(len(sample_index.postings))
+    filters = {
+        column: col.multiselect(EXPLORER_LABELS.get(column, column), list(postings), key=f"{key}_{column}")
+        for col, (column, postings) in zip(filter_columns, sample_index.postings.items())
+    }
+    ranges = {}
+    if element_filters and sample_index.elements:
+        col_elements, col_ranges = st.columns([1, 2])
+        for element in col_elements.multiselect("Filtrar por intervalo de elemento", sample_index.elements, key=f"{key}_elements"):
+            bounds = value_range(sample_index, element)
+            if bounds is not None and bounds[0] < bounds[1]:
+                ranges[element] = col_ranges.slider(element, bounds[0], bounds[1], bounds, key=f"{key}_range_{element}")
+
+    shown_columns = columns or list(sample_index.frame.columns)
+    col_sort, col_order, col_size, col_page = st.columns(4)
+    sort_by = col_sort.selectbox("Ordenar por", shown_columns, key=f"{key}_sort")
+    ascending = col_order.radio("Ordem", ["Ascendente", "Descendente"], horizontal=True, key=f"{key}_order") == "Ascendente"
+    page_size = col_size.selectbox("Linhas por página", EXPLORER_PAGE_SIZES, index=1, key=f"{key}_page_size")
+    page = col_page.number_input("Página", min_value=1, value=1, step=1, key=f"{key}_page")
+
+    df_page, n_matches = query(sample_index, filters, ranges, sort_by, ascending, page - 1, page_size, shown_columns)
+    n_pages = max(1, -(-n_matches // page_size))
+    if page > n_pages:  # filters shrank the result: show the last page instead
+        page = n_pages
+        df_page, n_matches = query(sample_index, filters, ranges, sort_by, ascending, page - 1, page_size, shown_columns)
+    st.dataframe(df_page, hide_index=True)
+    first = (page - 1) * page_size + 1 if n_matches else 0
+    st.caption(f"Amostras {first}–{first + len(df_page) - 1 if n_matches else 0} de {n_matches} (página {page} de {n_pages}).")
+
+
+def render_sample_info():
+    st.markdown(f"### {content.SAMPLES_TITLE}")
+    sample_index = load_sample_index(selected_site, site_version)
+    if sample_index is not None and 'Section' in sample_index.postings:
+        st.caption(" · ".join(content.SECTOR_COUNT.format(section=section, count=len(rows)) for section, rows in sample_index.postings['Section'].items()))
+        render_sample_explorer("reference", columns=[c for c in REFERENCE_COLUMNS if c in sample_index.frame.columns])
     else:
         st.warning("Não foi possível carregar os dados de referência ou faltam colunas necessárias ('Sample Reference', 'Section').")
 
-    st.markdown("### 3.2 Composição Mineralógica (Resultados DRX / XRD)")
-    
-    if df_mineralogical_s1 is not None and df_mineralogical_s2 is not None:
-        tab1, tab2 = st.tabs(["Mineralogia Sector 1 (%)", "Mineralogia Sector 2 (%)"])
-        with tab1:
-            st.dataframe(df_mineralogical_s1)
-            cols_to_plot_s1 = [col for col in ['Plagioclase', 'Quartz', 'Amphibole', 'Phyllosilicates', 'K-Feldspar', 'Hematite'] if col in df_mineralogical_s1.columns]
-            if 'Sample' in df_mineralogical_s1.columns and cols_to_plot_s1:
-                 st.bar_chart(df_mineralogical_s1.set_index("Sample")[cols_to_plot_s1])
-            else:
-                 st.warning("Não foi possível gerar o gráfico de mineralogia do Sector 1 (falta coluna 'Sample' ou colunas de dados).")
-        with tab2:
-            st.dataframe(df_mineralogical_s2)
-            cols_to_plot_s2 = [col for col in ['Plagioclase', 'Quartz', 'Amphibole', 'Phyllosilicates', 'K-Feldspar', 'Hematite'] if col in df_mineralogical_s2.columns]
-            if 'Sample' in df_mineralogical_s2.columns and cols_to_plot_s2:
-                 st.bar_chart(df_mineralogical_s2.set_index("Sample")[cols_to_plot_s2])
+
+@st.fragment
+def render_mineralogy():
+    st.markdown(f"### {content.MINERALOGY_TITLE}")
+
+    # Sections (and optionally other sites) are group keys of one long-format table;
+    # only per-group aggregates are sent to the browser
+    mineral_sites = tuple(st.multiselect("Sítios a comparar", available_sites, default=[selected_site] if selected_site in available_sites else [])) or (selected_site,)
+    df_means, df_quantiles = load_mineralogy_summary(data_store.version, mineral_sites)
+
+    if df_means is not None:
+        minerals = list(df_means.columns)
+        tab_means, tab_hist, tab_ternary, tab_samples = st.tabs([content.MINERAL_MEANS_TITLE, "Distribuições", "Diagrama ternário", "Amostras"])
+        with tab_means:
+            st.dataframe(df_means.round(1))
+            st.bar_chart(df_means, stack=False)
+            st.dataframe(df_quantiles.round(1), hide_index=True)
+            st.caption(content.MINERAL_QUANTILES_CAPTION)
+        with tab_hist:
+            hist_mineral = st.selectbox("Mineral", minerals, key="hist_mineral")
+            st.bar_chart(load_mineral_histogram(data_store.version, mineral_sites, hist_mineral), stack=False, x_label=f"{hist_mineral} (%)", y_label="Amostras")
+        with tab_ternary:
+            default_vertices = [m for m in TERNARY_MINERALS if m in minerals] or minerals[:3]
+            vertices = st.multiselect("Vértices do diagrama", minerals, default=default_vertices, max_selections=3)
+            if len(vertices) == 3:
+                df_density = load_ternary_density(data_store.version, mineral_sites, tuple(vertices))
+                ternary_key = content_key('ternary', df_density, tuple(vertices))
+                st.image(figure_cache().render(ternary_key, lambda: draw_ternary(df_density, vertices)))
+                st.caption(content.TERNARY_CAPTION)
             else:
-                 st.warning("Não foi possível gerar o gráfico de mineralogia do Sector 2 (falta coluna 'Sample' ou colunas de dados).")
+                st.info("Escolha três minerais.")
+        with tab_samples:
+            col_group, col_mineral, col_range = st.columns(3)
+            sample_group = col_group.selectbox("Sector", list(df_means.index))
+            range_mineral = col_mineral.selectbox("Filtrar por mineral", minerals, key="range_mineral")
+            low, high = col_range.slider("Intervalo (%)", 0, 100, (0, 100))
+            df_samples = load_mineral_samples(data_store.version, mineral_sites, sample_group, range_mineral, low, high)
+            st.dataframe(df_samples.head(MAX_DRILL_DOWN_ROWS), hide_index=True)
+            st.caption(f"{len(df_samples)} amostras" + (f"; mostradas as primeiras {MAX_DRILL_DOWN_ROWS}." if len(df_samples) > MAX_DRILL_DOWN_ROWS else "."))
     else:
         st.warning("Não foi possível carregar os dados mineralógicos.")
 
-    st.markdown("### 3.3 Composição Química (Resultados AAN / NAA)")
 
-    # --- Check df_chemical AFTER loading and processing ---
-    if df_chemical is not None and 'Sample' in df_chemical.columns:
-        st.markdown("#### Tabela Completa de Dados Químicos (Majoritários em %, Vestigiais em mg/kg)")
-        # Display the *processed* chemical data
-        st.dataframe(df_chemical) 
+@st.fragment
+def render_figure5(df_reference, ref_element):
+    # --- Recreate Figure 5 from the paper ---
+    st.markdown(f"#### {content.FIGURE5_TITLE.format(reference=ref_element)}")
+    st.markdown(f"*{content.FIGURE5_SOURCE}*")
 
-        # --- Recreate Figure 5 from the paper ---
-        st.markdown("#### Diferenças Químicas (Normalizadas a Sc)")
-        st.markdown("*(Baseado na Figura 5 do artigo)*")
+    if df_reference is None or 'Sample Reference' not in df_reference.columns or 'Section' not in df_reference.columns:
+        st.warning("Não foi possível juntar a informação do sector. Verifique as colunas dos dados de referência ('Sample Reference', 'Section').")
 
-        df_plot = df_chemical.copy()
+    # Ratios, sector merge and per-sector outliers come from one cached call;
+    # on a cache miss its "ratios", "merge" and "outliers" steps are timed as sub-stages
+    with profiler.stage("normalization"):
+        df_plot, df_outliers = load_figure5(selected_site, site_version, ref_element, _stage=profiler.stage)
 
-        # Merge section info - df_chemical now has 'Sample', df_reference has 'Sample Reference'
-        if df_reference is not None and 'Sample Reference' in df_reference.columns and 'Section' in df_reference.columns:
-            df_plot = pd.merge(
-                df_plot, df_reference[['Sample Reference', 'Section']],
+    if df_plot is None:
+        # More informative warning if columns are missing
+        st.warning(f"Não foi possível criar os gráficos. Faltam colunas necessárias para normalização. Necessárias: {list(NORM_COLUMNS)} e {ref_element}.")
+    elif df_plot.empty:
+        st.warning("Não há dados válidos disponíveis para gerar os gráficos após normalização e filtragem.")
+    else:
+        with profiler.stage("figure5"):
+            fig5_key = content_key('figure5', df_plot[['Sample', 'Section', 'Na_norm', 'Fe_norm', 'K_norm']], df_outliers['Sample'], ref_element)
+            st.image(figure_cache().render(fig5_key, lambda: draw_figure5(df_plot, df_outliers, ref_element)))
+        st.caption(content.FIGURE5_CAPTION.format(
+            samples=', '.join(str(int(x)) for x in df_outliers['Sample']) or content.FIGURE5_NO_OUTLIERS))
+
+
+@st.fragment
+def render_clustering(df_reference, ref_element):
+    # --- Hierarchical clustering of the chemical fingerprints ---
+    st.markdown(f"#### {content.CLUSTERING_TITLE.format(reference=ref_element)}")
+    cluster_tree = load_cluster_tree(selected_site, site_version, ref_element)
+    if cluster_tree is not None:
+        n_clusters = st.slider("Número de grupos", min_value=2, max_value=min(10, len(cluster_tree.leaves)), value=min(N_CLUSTERS, len(cluster_tree.leaves)))
+        cluster_labels = cut_tree(cluster_tree, n_clusters)
+
+        with profiler.stage("dendrogram"):
+            tree_key = content_key('dendrogram', cluster_tree.source, cluster_tree.linkage, n_clusters)
+            st.image(figure_cache().render(tree_key, lambda: draw_dendrogram(cluster_tree, n_clusters)))
+
+        df_clusters = pd.DataFrame({'Sample': cluster_tree.samples, 'Grupo': cluster_labels})
+        if df_reference is not None and 'Sample Reference' in df_reference.columns:
+            df_clusters = df_clusters.merge(
+                df_reference[['Sample Reference', 'Section', 'Type']],
                 left_on='Sample', right_on='Sample Reference', how='left'
-            )
-            # Optional: Drop the redundant 'Sample Reference' column
-            # if 'Sample Reference' in df_plot.columns:
-            #    df_plot = df_plot.drop(columns=['Sample Reference'])
+            ).drop(columns='Sample Reference')
+        st.dataframe(df_clusters.sort_values(['Grupo', 'Sample']).reset_index(drop=True))
+    else:
+        st.warning("Não há amostras suficientes para a clusterização hierárquica.")
+
+
+@st.fragment
+def render_correlation(df_reference):
+    # --- Pearson correlation between elements ---
+    st.markdown(f"#### {content.CORRELATION_TITLE}")
+    corr_sections, corr_types = (), ()
+    if df_reference is not None and 'Section' in df_reference.columns and 'Type' in df_reference.columns:
+        col_sec, col_type = st.columns(2)
+        corr_sections = tuple(sorted(col_sec.multiselect("Sectores", sorted(df_reference['Section'].dropna().unique()))))
+        corr_types = tuple(sorted(col_type.multiselect("Tipos", sorted(df_reference['Type'].dropna().unique()))))
+    df_corr, corr_counts = load_correlation(selected_site, site_version, corr_sections, corr_types)
+
+    if df_corr is not None and corr_counts.max() >= 3:
+        with profiler.stage("correlation_heatmap"):
+            corr_key = content_key('correlation', df_corr, corr_counts.max())
+            st.image(figure_cache().render(corr_key, lambda: draw_correlation(df_corr, corr_counts.max())))
+        st.caption(content.CORRELATION_CAPTION)
+    else:
+        st.warning("O subconjunto seleccionado não tem amostras suficientes para calcular correlações.")
+
+
+@st.fragment
+def render_pca():
+    # --- clr-PCA biplot over all elements ---
+    st.markdown("#### Análise de Componentes Principais (clr)")
+    pca_model = load_pca_model(selected_site, site_version)
+    if pca_model is None:
+        st.warning("Não há amostras ou elementos suficientes para a PCA.")
+        return
+
+    components = [f"PC{i + 1}" for i in range(len(pca_model.components))]
+    col_x, col_y, col_color = st.columns(3)
+    pc_x = col_x.selectbox("Eixo x", components, index=0, key="pca_x")
+    pc_y = col_y.selectbox("Eixo y", components, index=min(1, len(components) - 1), key="pca_y")
+    color_by = col_color.radio("Cor", ['Section', 'Type'], format_func=EXPLORER_LABELS.get, horizontal=True, key="pca_color")
+
+    # New samples are projected with the cached model; nothing is refitted
+    df_new = None
+    uploaded = st.file_uploader("Projetar amostras novas (CSV no formato chemical_contents)", type="csv", key="pca_upload")
+    if uploaded is not None:
+        try:
+            df_upload = chemistry_frame(parse_chemical_table(uploaded))
+        except Exception as e:
+            st.error(f"Não foi possível ler o ficheiro carregado: {e}")
         else:
-            st.warning("Não foi possível juntar a informação do sector. Verifique as colunas dos dados de referência ('Sample Reference', 'Section').")
-            df_plot['Section'] = 'Desconhecido' # Fallback
-
-        # --- Plotting Logic (Mostly unchanged, check column names just in case) ---
-        # Check for element columns (use the names from the transposed df)
-        # Make sure element names from CSV (like 'Na₂O') are correctly handled if they have special characters
-        required_cols_chem = ['Fe₂O₃', 'K₂O', 'Na₂O', 'Sc']
-        
-        # Check if all required columns exist in df_plot
-        missing_cols = [col for col in required_cols_chem if col not in df_plot.columns]
-
-        if not missing_cols and 'Section' in df_plot.columns:
-            # Convert required columns to numeric again just in case (might be redundant but safe)
-            for col in required_cols_chem:
-                 df_plot[col] = pd.to_numeric(df_plot[col], errors='coerce')
-            
-            # Avoid division by zero or NaN/missing Sc values
-            df_plot = df_plot.dropna(subset=['Sc'])
-            df_plot = df_plot[df_plot['Sc'] > 0]
-
-            # Normalize data
-            df_plot['Fe_norm'] = df_plot['Fe₂O₃'] / df_plot['Sc']
-            df_plot['K_norm'] = df_plot['K₂O'] / df_plot['Sc']
-            df_plot['Na_norm'] = df_plot['Na₂O'] / df_plot['Sc']
-
-            # Handle potential NaN/inf values created during normalization
-            df_plot.replace([np.inf, -np.inf], np.nan, inplace=True)
-            df_plot.dropna(subset=['Fe_norm', 'K_norm', 'Na_norm'], inplace=True)
-
-            if not df_plot.empty:
-                fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
-                colors = {1: 'blue', 2: 'red', 'Desconhecido': 'grey'}
-                markers = {1: 'o', 2: 's', 'Desconhecido': '^'}
-
-                # Plot Fe vs Na (Normalized)
-                for section in df_plot['Section'].unique():
-                    group = df_plot[df_plot['Section'] == section]
-                    label_txt = f'Sector {section}' if section != 'Desconhecido' else 'Sector Desconhecido'
-                    ax1.scatter(group['Na_norm'], group['Fe_norm'],
-                                label=label_txt,
-                                color=colors.get(section, 'black'), marker=markers.get(section, 'x'), alpha=0.7)
-                    for i, row in group.iterrows():
-                        if row['Sample'] == 163 or row['Sample'] == 183:
-                            ax1.text(row['Na_norm'] * 1.01, row['Fe_norm'] * 1.01, str(int(row['Sample'])))
-                ax1.set_xlabel('Na₂O / Sc') # Match exact element name
-                ax1.set_ylabel('Fe₂O₃ / Sc') # Match exact element name
-                ax1.set_title('Fe vs Na (Normalizado)')
-                ax1.legend()
-                ax1.grid(True, linestyle='--', alpha=0.6)
-
-                # Plot K vs Na (Normalized)
-                for section in df_plot['Section'].unique():
-                    group = df_plot[df_plot['Section'] == section]
-                    label_txt = f'Sector {section}' if section != 'Desconhecido' else 'Sector Desconhecido'
-                    ax2.scatter(group['Na_norm'], group['K_norm'],
-                                label=label_txt,
-                                color=colors.get(section, 'black'), marker=markers.get(section, 'x'), alpha=0.7)
-                    for i, row in group.iterrows():
-                        if row['Sample'] == 163 or row['Sample'] == 183:
-                            ax2.text(row['Na_norm'] * 1.01, row['K_norm'] * 1.01, str(int(row['Sample'])))
-                ax2.set_xlabel('Na₂O / Sc') # Match exact element name
-                ax2.set_ylabel('K₂O / Sc') # Match exact element name
-                ax2.set_title('K vs Na (Normalizado)')
-                ax2.legend()
-                ax2.grid(True, linestyle='--', alpha=0.6)
-
-                plt.tight_layout()
-                st.pyplot(fig)
-
+            missing = missing_features(pca_model, df_upload)
+            if missing:
+                st.error(f"O ficheiro não tem {len(missing)} dos {len(pca_model.features)} elementos do modelo "
+                         f"({', '.join(missing)}); as amostras não foram projetadas.")
             else:
-                 st.warning("Não há dados válidos disponíveis para gerar os gráficos após normalização e filtragem.")
+                df_new = project(pca_model, df_upload)
+
+    df_scores = load_pca_scores(selected_site, site_version)
+    df_shown = df_scores.sample(MAX_BIPLOT_POINTS, random_state=0) if len(df_scores) > MAX_BIPLOT_POINTS else df_scores
+    st.altair_chart(biplot_chart(df_shown, loadings(pca_model), pc_x, pc_y, color_by, df_new), width="stretch")
+    ratio = dict(zip(components, pca_model.explained_ratio))
+    st.caption(f"{pc_x}: {ratio[pc_x]:.0%} e {pc_y}: {ratio[pc_y]:.0%} da variância; {len(pca_model.features)} elementos em coordenadas clr "
+               f"(valores n.d. substituídos por metade do mínimo detectado)."
+               + (f" Mostra-se uma amostra aleatória de {MAX_BIPLOT_POINTS} das {len(df_scores)} amostras." if len(df_scores) > MAX_BIPLOT_POINTS else ""))
+
+
+@st.fragment
+def render_provenance(df_chemical):
+    # --- Provenance: nearest reference samples across all sites ---
+    st.markdown("#### Proveniência: Amostras de Referência Mais Próximas")
+    provenance_index = load_provenance_index(data_store.version)
+    if provenance_index is not None:
+        query_mode = st.radio("Amostra a comparar", ["Amostra existente", "Carregar CSV (formato chemical_contents)"], horizontal=True)
+        k_neighbours = st.slider("Número de vizinhos (k)", min_value=1, max_value=min(20, provenance_index.tree.n), value=min(5, provenance_index.tree.n))
+
+        df_query, exclude_site = None, None
+        if query_mode == "Amostra existente":
+            query_sample = st.selectbox("Amostra", df_chemical['Sample'].tolist())
+            df_query = df_chemical[df_chemical['Sample'] == query_sample]
+            exclude_site = selected_site
         else:
-            # More informative warning if columns are missing
-            st.warning(f"Não foi possível criar os gráficos. Faltam colunas necessárias para normalização ou informação de sector. Necessárias: {required_cols_chem + ['Section']}. Faltando em df_plot: {missing_cols}")
+            uploaded = st.file_uploader("Ficheiro CSV com linhas 'Element' e uma coluna por amostra", type="csv")
+            if uploaded is not None:
+                try:
+                    df_query = chemistry_frame(parse_chemical_table(uploaded))
+                except Exception as e:
+                    st.error(f"Não foi possível ler o ficheiro carregado: {e}")
+
+        if df_query is not None:
+            # Elements a query lacks are filled with the index medians, so report how many are real
+            n_features, needed = len(provenance_index.features), min_features(provenance_index)
+            df_matches = None
+            try:
+                measured, absent = feature_coverage(provenance_index, df_query)
+                if absent:
+                    st.info(f"Elementos do índice ausentes da consulta: {', '.join(absent)}.")
+                too_few = measured[measured < needed]
+                if not too_few.empty:
+                    st.warning(f"Amostras com menos de {needed} dos {n_features} elementos do índice, não comparadas: "
+                               + ", ".join(f"{sample} ({count})" for sample, count in too_few.items()) + ".")
+                if len(too_few) < len(measured):
+                    df_matches = nearest_references(provenance_index, df_query, k=k_neighbours, exclude_self=exclude_site)
+            except (KeyError, ValueError) as e:
+                st.error(f"Não foi possível comparar a consulta com o índice: {e}")
+            if df_matches is not None:
+                st.dataframe(df_matches)
+                st.caption(f"Distância euclidiana no espaço log(elemento/{provenance_index.reference}) sobre {n_features} elementos "
+                           f"(elementos em falta substituídos pela mediana do índice; 'Features' = elementos medidos); "
+                           f"{provenance_index.tree.n} amostras de referência indexadas.")
     else:
-        # This warning should NOT appear now if loading was successful
-        st.warning("Não foi possível carregar ou processar corretamente os dados químicos (falta a coluna 'Sample' após processamento). Verifique a função `load_data` e o ficheiro CSV.")
-
-    
+        st.warning("Não há dados químicos com Sc no arquivo para construir o índice de proveniência.")
 
-# 4. Discussion & Conclusions
-with st.expander("4. Discussão e Conclusões"):
-    st.markdown("""
-    <h3 style="color:#388cb0;">Conclusões e Implicações</h3>
-                
-    As cerâmicas calcolíticas de Santa Vitória sugerem uma produção local dominante, compatível com o contexto geológico regional (gabros e dioritos), embora trocas regionais não sejam descartáveis. Variações tecnológicas, como diferenças nos temperantes e heterogeneidade química entre secções, indicam distinções nas práticas de produção ou grupos sociais. 
-    
-    <li><b style="color:#808b96;">Limitações:</b>
-        <ul>
-            <li>Falta de análise de matérias-primas locais para comparação direta.</li>
-            <li>Número limitado de amostras por tipologia cerâmica.</li>
-        </ul>
-    </li>
-    
-    <li><b style="color:#808b96;">Perspectivas futuras:</b>
-        <ul>
-            <li>Estudos complementares com argilas regionais e mais amostras para confirmar padrões.</li>
-            <li>Análises isotópicas ou de luminescência para refinamento cronológico.</li>
-        </ul>
-    </li>
-    </ul>
-    """, unsafe_allow_html=True)
-
-# 5. Student Perspective
-st.markdown("---")
-st.markdown("""
-    <h3 style="color:#076aa6;"> Contributo para a Área de Estudo</h3>
-    """, unsafe_allow_html=True) 
-st.markdown("""
-**Enquanto estudantes de licenciatura, é pertinente começarmos a pensar de que modo podemos aplicar os conhecimentos adquiridos em benefício de um propósito maior. 
-Portanto, a questão que se pretende abordar nesta secção é a seguinte: de que forma podemos intervir ou contribuir para o avanço da área de estudo apresentada?**
-""")
-
-st.subheader("Licenciatura em Engenharia Mecânica (LEMEC)")
-st.markdown("""
-*   Melhorar a Análise dos Materiais 
-*   Usar softwares como SolidWorks para simular:
-    *   Como as cerâmicas se comportam sob pressão ou calor (ex.: resistência ao quebrar).
-    *   Se a temperatura de queima (inferior a 850°C, como no estudo) afeta sua durabilidade.
-""")
-st.markdown("---")
-st.markdown("""
-*   Recriação de Forno Experimental
-*   **Objetivo:** Testar o comportamento da argila local em diferentes temperaturas de queima.
-*   **Metodologia:**
-    *   Construir um forno em escala reduzida, considerando princípios de termodinâmica.
-    *   Testar temperaturas entre 700°C e 900°C.
-    *   Medir tempo de queima, taxa de resfriamento e resistência do material.
-
-*   **Aplicação:** Validar se a queima abaixo de 850°C produzia cerâmica resistente ou se era uma limitação técnica da época.
-""")
-st.markdown("---")
-st.subheader("Licenciatura em Engenharia Informática e de Computadores (LEIC)")
-st.markdown("""
-Como futuro profissional, destaco:
 
-*   **Análise rápida:** Usar IA para processar dados químicos e mineralógicos das cerâmicas de Santa Vitória de forma eficiente.  
-*   **Ligações:** Relacionar dados de vários sítios a alta velocidade, revelando redes de troca.  
-*   **Ferramentas:** Criar plataformas que tornem os resultados acessíveis a todos.  
-*   *(Nota:)* A informática potencia a arqueologia sem a substituir.
-""")
+# 3. Results
+section_3 = st.expander(content.SECTION_3_TITLE, key="section_3", on_change="rerun")
+if section_3.open:
+    with profiler.stage("section_3"), section_3:
+        with profiler.stage("load_data"):
+            df_reference, df_chemical = load_data(selected_site, site_version)
+
+        render_sample_info()
+        render_mineralogy()
+
+        st.markdown(f"### {content.CHEMISTRY_TITLE}")
+
+        # --- Check df_chemical AFTER loading and processing ---
+        if df_chemical is not None and 'Sample' in df_chemical.columns:
+            st.markdown(f"#### {content.CHEMISTRY_TABLE_TITLE}")
+            # Paged from the sample index instead of sending the whole table
+            render_sample_explorer("chemistry", columns=list(df_chemical.columns), element_filters=True)
+
+            # The reference element feeds several blocks, so changing it reruns the whole section
+            # Figure 5's own oxides and the derived indices (Eu/Eu*, ΣREE, ...) cannot be the reference
+            element_options = [col for col in df_chemical.columns
+                               if col != 'Sample' and col not in NORM_COLUMNS and col not in DERIVED_COLUMNS]
+            ref_element = st.selectbox(
+                "Elemento de referência para normalização", element_options,
+                index=element_options.index('Sc') if 'Sc' in element_options else 0
+            )
+            render_figure5(df_reference, ref_element)
+            render_clustering(df_reference, ref_element)
+            render_correlation(df_reference)
+            render_pca()
+            render_provenance(df_chemical)
+        else:
+            # This warning should NOT appear now if loading was successful
+            st.warning("Não foi possível carregar ou processar corretamente os dados químicos (falta a coluna 'Sample' após processamento). Verifique a função `load_data` e o ficheiro CSV.")
 
-# 6. Reference 
-st.markdown("---")
-st.subheader("Referência")
-st.markdown("Marques, R.; Rodrigues, A.L.; Russo, D.; Gméling, K.; Valera, A.C.; Dias, M.I.; Prudêncio, M.I.; Basílio, A.C.; Fernandes, P.G.; Ruiz, F. Fingerprinting Ceramics from the Chalcolithic Santa Vitória Enclosure (SW Iberia). *Minerals* **2024**, *14*, 399. [https://doi.org/10.3390/min14040399](https://doi.org/10.3390/min14040399)")
 
-# Footer
-st.markdown("---")
-st.caption("Aplicação Streamlit desenvolvida para a disciplina de Património Cultural e Ciências, baseada no artigo fornecido e nos critérios de avaliação.")
\ No newline at end of file
+# 4. Discussion & Conclusions
+with profiler.stage("section_4"), st.expander(content.SECTION_4_TITLE):
+    st.markdown(content.SECTION_4, unsafe_allow_html=True)
+
+# 5. Student Perspective, 6. Reference and footer
+for kind, text in content.CLOSING:
+    if kind == "divider":
+        st.markdown("---")
+    elif kind == "subheader":
+        st.subheader(text)
+    elif kind == "caption":
+        st.caption(text)
+    else:
+        st.markdown(text, unsafe_allow_html=(kind == "html"))
+
+# --- Profiling panel (only when profiling is enabled) ---
+if profiler.enabled:
+    with st.sidebar.expander("Perfil de desempenho", expanded=True):
+        profile_records = profiler.summary()
+        st.dataframe(pd.DataFrame({
+            'Etapa': ['\u00a0\u00a0' * r['depth'] + r['stage'] for r in profile_records],
+            'Tempo (ms)': [round(r['seconds'] * 1000, 1) for r in profile_records],
+            'Pico (KiB)': [r['peak_kib'] for r in profile_records],
+        }), hide_index=True)
+        st.caption(f"Execução {profiler.run_id}; registos acrescentados a `{profiler.log_file}`. "
+                   "Os reruns de fragmentos não são medidos.")
+        st.download_button(
+            "Exportar JSONL", "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in profile_records),
+            file_name=f"profile-{profiler.run_id}.jsonl", mime="application/jsonl"
+        )
+
+# Stop tracemalloc once the rerun is over (if no other session is profiling)
+profiler.close()
@@ -0,0 +1,126 @@
+"""Unified long-format mineralogy with server-side aggregation.
+
+Every site's semi-quantitative XRD table becomes rows of (Site, Section,
+Sample, Mineral, Percent), so sections and sites are just group keys. The
+app only sends the aggregates computed here (means, quantiles, binned
+histograms, ternary-diagram density) to the browser, whatever the number of
+samples, and pivots a single group back to wide rows for the drill-down.
+"""
+import numpy as np
+import pandas as pd
+
+MINERALS = ['Plagioclase', 'Quartz', 'Amphibole', 'Phyllosilicates', 'K-Feldspar', 'Hematite']
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+TERNARY_MINERALS = ('Quartz', 'Plagioclase', 'Phyllosilicates')  # default vertices of the ternary diagram
+
+
+def long_frame(store, sites):
+    """Mineralogy of ``sites`` as one long frame: Site, Section, Sample, Mineral, Percent."""
+    sites = [site for site in dict.fromkeys(sites) if site in store.sites() and 'mineralogy' in store.tables(site)]
+    tables = [store.read(site, 'mineralogy') for site in sites]
+    columns = [[c for c in df.columns if c not in ('Sample', 'Section')] for df in tables]
+    # Known minerals first, in the paper's order, then whatever else a site reports
+    reported = {m for cols in columns for m in cols}
+    minerals = [m for m in MINERALS if m in reported] + sorted(reported - set(MINERALS))
+    position = {m: i for i, m in enumerate(minerals)}
+
+    # Built from the wide arrays directly (same row order as DataFrame.melt)
+    parts = {'Site': [], 'Section': [], 'Sample': [], 'Mineral': [], 'Percent': []}
+    for code, (df, cols) in enumerate(zip(tables, columns)):
+        n = len(df)
+        parts['Site'].append(np.full(n * len(cols), code, dtype=np.int32))
+        parts['Section'].append(np.tile(df['Section'].to_numpy(), len(cols)))
+        parts['Sample'].append(np.tile(df['Sample'].to_numpy(), len(cols)))
+        parts['Mineral'].append(np.repeat(np.array([position[m] for m in cols], dtype=np.int32), n))
+        parts['Percent'].append(df[cols].to_numpy().T.ravel())
+    if not tables:
+        return pd.DataFrame(columns=list(parts))
+
+    df_long = pd.DataFrame({
+        'Site': pd.Categorical.from_codes(np.concatenate(parts['Site']), categories=sites),
+        'Section': np.concatenate(parts['Section']),
+        'Sample': np.concatenate(parts['Sample']),
+        'Mineral': pd.Categorical.from_codes(np.concatenate(parts['Mineral']), categories=minerals),
+        'Percent': np.concatenate(parts['Percent']),
+    })
+    return df_long.dropna(subset=['Percent']).reset_index(drop=True)
+
+
+def group_labels(df_long):
+    """'Sector N', or 'site · Sector N' once more than one site is present (categorical)."""
+    site_codes = df_long['Site'].cat.codes.to_numpy(dtype=np.int64)
+    sections = df_long['Section'].to_numpy(dtype=np.int64)
+    # Labels are built once per (site, section), not once per row
+    keys, inverse = np.unique(site_codes * 1_000_000 + sections, return_inverse=True)
+    multi_site = len(np.unique(site_codes)) > 1
+    labels = [f"{df_long['Site'].cat.categories[k // 1_000_000]} · Sector {k % 1_000_000}" if multi_site
+              else f"Sector {k % 1_000_000}" for k in keys]
+    return pd.Series(pd.Categorical.from_codes(inverse.ravel(), categories=labels), index=df_long.index)
+
+
+def _grouped(df_long):
+    return df_long.assign(Group=group_labels(df_long)).groupby(['Group', 'Mineral'], observed=True)['Percent']
+
+
+def group_means(df_long):
+    """Mean percentage per group (rows) and mineral (columns)."""
+    df_means = _grouped(df_long).mean().unstack('Mineral')
+    df_means.columns = list(df_means.columns)  # plain labels, not CategoricalIndexes
+    df_means.index = pd.Index(list(df_means.index), name='Sector')
+    return df_means
+
+
+def group_quantiles(df_long, quantiles=QUANTILES):
+    """Sample count and quantiles of every mineral per group, one row per (group, mineral)."""
+    grouped = _grouped(df_long)
+    df_q = grouped.quantile(list(quantiles)).unstack()
+    df_q.columns = [f"q{round(q * 100):02d}" for q in quantiles]
+    df_q.insert(0, 'n', grouped.size())
+    return df_q.reset_index()
+
+
+def histograms(df_long, mineral, bin_width=5):
+    """Sample counts of ``mineral`` in ``bin_width``-% bins; one column per group."""
+    df = df_long[df_long['Mineral'] == mineral]
+    edges = np.arange(0, 100 + bin_width, bin_width)
+    bins = np.clip(df['Percent'].to_numpy(dtype=np.float64) // bin_width, 0, len(edges) - 2).astype(int)
+    counts = pd.crosstab(pd.Series(bins, name='bin'), group_labels(df).to_numpy())
+    counts = counts.reindex(range(len(edges) - 1), fill_value=0)
+    counts.index = [f"{lo:g}–{hi:g}" for lo, hi in zip(edges[:-1], edges[1:])]
+    counts.columns.name = None
+    return counts
+
+
+def ternary_density(df_long, minerals, n_bins=10):
+    """Counts of samples per triangular cell of the (a, b, c) ternary diagram.
+
+    The three minerals are re-closed to 100% per sample and binned on an
+    ``n_bins`` grid of the first two fractions; each occupied cell is returned
+    once per group with its sample count and the mean fractions of its
+    samples (so every point stays inside the triangle).
+    """
+    df = df_long[df_long['Mineral'].isin(minerals)].assign(Group=lambda d: group_labels(d))
+    wide = df.pivot(index=['Group', 'Site', 'Sample'], columns='Mineral', values='Percent')
+    wide = wide.reindex(columns=list(minerals)).dropna()
+    totals = wide.sum(axis=1).to_numpy(dtype=np.float64)
+    wide = wide[totals > 0]
+    fractions = wide.to_numpy(dtype=np.float64) / totals[totals > 0, None]
+
+    cells = pd.DataFrame(fractions, columns=list(minerals))
+    cells.insert(0, 'Group', wide.index.get_level_values('Group'))
+    cells['i'] = np.minimum((fractions[:, 0] * n_bins).astype(int), n_bins - 1)
+    cells['j'] = np.minimum((fractions[:, 1] * n_bins).astype(int), n_bins - 1)
+    grouped = cells.groupby(['Group', 'i', 'j'], sort=False)
+    df_density = grouped[list(minerals)].mean()
+    df_density.insert(0, 'count', grouped.size())
+    return df_density.reset_index().drop(columns=['i', 'j'])
+
+
+def drill_down(df_long, group, mineral=None, low=0, high=100):
+    """Wide rows (Sample + minerals) of one group, optionally within a range of one mineral."""
+    df = df_long[group_labels(df_long) == group]
+    wide = df.pivot(index='Sample', columns='Mineral', values='Percent').dropna(axis=1, how='all')
+    if mineral is not None and mineral in wide.columns:
+        wide = wide[wide[mineral].between(low, high)]
+    wide.columns = list(wide.columns)
+    return wide.reset_index()
@@ -0,0 +1,206 @@
+"""Robust multivariate outlier detection for the normalized chemistry.
+
+Location and scatter come from a Minimum Covariance Determinant estimate
+(FastMCD-style concentration steps, vectorized over all samples). Samples
+whose robust squared Mahalanobis distance exceeds the chi-square quantile
+are flagged. This replaces hand-picked sample labels in the plots.
+
+The MCD consistency and reweighting factors are asymptotic; on a handful of
+samples they inflate the distances and flag regular sherds. Groups with at
+most ``ROWS_PER_DIMENSION`` rows per dimension (ditch1's sectors have 10 and
+15 samples in 3 dimensions) use the classical mean and covariance instead,
+with the exact finite-sample (Beta) cutoff of ``classical_cutoff``.
+
+    python outliers.py [site]   # flagged samples of the site's Figure 5
+"""
+import contextlib
+import sys
+
+import numpy as np
+from scipy.stats import beta, chi2
+
+from chemistry import ratio_matrix
+
+MAX_SEARCH_ROWS = 1500  # the subset search runs on at most this many rows
+ROWS_PER_DIMENSION = 5  # the robust fit needs more than this many rows per dimension
+OUTLIER_SUPPORT = 0.75  # share of each sector the robust (MCD) fit of Figure 5 uses
+NORM_COLUMNS = {'Na₂O': 'Na_norm', 'Fe₂O₃': 'Fe_norm', 'K₂O': 'K_norm'}  # Figure 5 oxide -> ratio column
+
+
+def _mahalanobis_sq(X, location, covariance):
+    centered = X - location
+    # Small ridge so near-singular scatter (tiny sections) stays invertible
+    ridge = 1e-9 * np.trace(covariance) / len(covariance) * np.eye(len(covariance))
+    solved = np.linalg.solve(covariance + ridge, centered.T).T
+    return np.einsum('ij,ij->i', centered, solved)
+
+
+def _c_steps(X, subset, h, steps):
+    """Concentration steps: refit on the h rows closest to the current fit."""
+    for _ in range(steps):
+        location = X[subset].mean(axis=0)
+        covariance = np.cov(X[subset], rowvar=False)
+        new_subset = np.argpartition(_mahalanobis_sq(X, location, covariance), h - 1)[:h]
+        if np.array_equal(np.sort(new_subset), np.sort(subset)):
+            break
+        subset = new_subset
+    location = X[subset].mean(axis=0)
+    covariance = np.atleast_2d(np.cov(X[subset], rowvar=False))
+    return subset, location, covariance
+
+
+def mcd(X, support_fraction=None, n_starts=30, steps=20, seed=0):
+    """Reweighted MCD location and (consistency-corrected) covariance.
+
+    ``support_fraction`` is the share of rows the raw estimate is fitted on;
+    the default (n + p + 1) / 2 rows gives the highest breakdown point.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    n, p = X.shape
+    if n <= p + 1:
+        raise ValueError(f"need more than {p + 1} samples for a {p}-dimensional MCD")
+    rng = np.random.default_rng(seed)
+    h = (n + p + 1) // 2 if support_fraction is None else max(int(support_fraction * n), p + 2)
+
+    # Search on a subsample for large n, then refine on all rows
+    search = X if n <= MAX_SEARCH_ROWS else X[rng.choice(n, MAX_SEARCH_ROWS, replace=False)]
+    h_search = h if search is X else int(h * len(search) / n)
+
+    best_det, best_location, best_covariance = np.inf, None, None
+    for _ in range(n_starts):
+        start = rng.choice(len(search), size=p + 1, replace=False)
+        _, location, covariance = _c_steps(search, start, h_search, steps)
+        sign, logdet = np.linalg.slogdet(covariance)
+        if sign > 0 and logdet < best_det:
+            best_det, best_location, best_covariance = logdet, location, covariance
+    if best_location is None:
+        best_location, best_covariance = np.median(X, axis=0), np.atleast_2d(np.cov(X, rowvar=False))
+
+    start = np.argpartition(_mahalanobis_sq(X, best_location, best_covariance), h - 1)[:h]
+    _, location, covariance = _c_steps(X, start, h, steps)
+
+    # Rescale so distances of clean Gaussian data follow chi2(p)
+    d2 = _mahalanobis_sq(X, location, covariance)
+    covariance = covariance * np.median(d2) / chi2.ppf(0.5, p)
+
+    # Reweighting step: refit on every row the raw estimate considers regular
+    inliers = _mahalanobis_sq(X, location, covariance) <= chi2.ppf(0.975, p)
+    location = X[inliers].mean(axis=0)
+    covariance = np.atleast_2d(np.cov(X[inliers], rowvar=False))
+    # Consistency factor for a covariance computed on a chi2-truncated sample
+    share = inliers.mean()
+    covariance = covariance * share / chi2.cdf(chi2.ppf(share, p), p + 2)
+    return location, covariance
+
+
+def robust_distances(X, **kwargs):
+    """Squared robust Mahalanobis distance of every row of ``X``."""
+    location, covariance = mcd(X, **kwargs)
+    return _mahalanobis_sq(np.asarray(X, dtype=np.float64), location, covariance)
+
+
+def classical_distances(X):
+    """Squared Mahalanobis distance of every row from the sample mean and covariance."""
+    X = np.asarray(X, dtype=np.float64)
+    return _mahalanobis_sq(X, X.mean(axis=0), np.atleast_2d(np.cov(X, rowvar=False)))
+
+
+def classical_cutoff(n, p, quantile=0.975):
+    """Squared classical distance above which one of ``n`` Gaussian rows is an outlier.
+
+    With the mean and covariance estimated from the same rows,
+    n * d2 / (n - 1)**2 follows Beta(p / 2, (n - p - 1) / 2) exactly; the
+    chi-square limit is never reached in small groups (d2 <= (n - 1)**2 / n).
+    """
+    return (n - 1) ** 2 / n * beta.ppf(quantile, p / 2, (n - p - 1) / 2)
+
+
+def flag_outliers(X, quantile=0.975, min_size=None, **kwargs):
+    """Returns (squared distances, boolean outlier flags) for the rows of ``X``.
+
+    Rows containing NaN are never flagged and get a NaN distance. With fewer
+    than ``min_size`` complete rows (default ``ROWS_PER_DIMENSION * p + 1``)
+    the classical distances and their finite-sample cutoff are used instead
+    of the MCD and the chi-square quantile.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    p = X.shape[1]
+    min_size = ROWS_PER_DIMENSION * p + 1 if min_size is None else min_size
+    complete = ~np.isnan(X).any(axis=1)
+    d2 = np.full(len(X), np.nan)
+    flags = np.zeros(len(X), dtype=bool)
+    if complete.sum() > p + 1:
+        n = int(complete.sum())
+        if n >= min_size:
+            d2[complete] = robust_distances(X[complete], **kwargs)
+            flags[complete] = d2[complete] > chi2.ppf(quantile, p)
+        else:
+            d2[complete] = classical_distances(X[complete])
+            flags[complete] = d2[complete] > classical_cutoff(n, p, quantile)
+    return d2, flags
+
+
+def flag_by_group(X, groups, **kwargs):
+    """``flag_outliers`` run separately inside each group (e.g. ditch section)."""
+    X = np.asarray(X, dtype=np.float64)
+    d2 = np.full(len(X), np.nan)
+    flags = np.zeros(len(X), dtype=bool)
+    codes = np.unique(np.asarray(groups, dtype=object).astype(str), return_inverse=True)[1]
+    for code in np.unique(codes):
+        rows = np.flatnonzero(codes == code)
+        d2[rows], flags[rows] = flag_outliers(X[rows], **kwargs)
+    return d2, flags
+
+
+def flag_log_ratios(df_plot, columns, group='Section', **kwargs):
+    """Per-group outlier flags on the log of ratio columns (e.g. Figure 5's *_norm)."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_values = np.log(df_plot[columns].to_numpy(dtype=np.float64))
+    log_values[~np.isfinite(log_values)] = np.nan
+    return flag_by_group(log_values, df_plot[group], **kwargs)[1]
+
+
+
+def figure5_frame(df_chem, df_ref, reference='Sc', support_fraction=OUTLIER_SUPPORT, stage=None):
+    """(df_plot, df_outliers) behind Figure 5, shared by the app, the reports and the snapshot.
+
+    ``df_plot`` holds every sample's Na, Fe and K ratios to ``reference``
+    (``NORM_COLUMNS``) and its 'Section' ('Desconhecido' without reference
+    data); ``df_outliers`` its rows flagged per sector. Raises KeyError if
+    ``reference`` or one of the plotted oxides is missing. ``stage`` is an
+    optional name -> context manager hook (e.g. ``Profiler.stage``) that
+    times the 'ratios', 'merge' and 'outliers' steps.
+    """
+    stage = stage or (lambda name: contextlib.nullcontext())
+    with stage("ratios"):
+        df_plot = ratio_matrix(df_chem, reference)
+    missing = [c for c in NORM_COLUMNS if c not in df_plot.columns]
+    if missing:
+        raise KeyError(f"Figure 5 needs {', '.join(missing)} besides the reference '{reference}'")
+    with stage("merge"):
+        if df_ref is not None and {'Sample Reference', 'Section'} <= set(df_ref.columns):
+            df_plot = df_plot.merge(df_ref[['Sample Reference', 'Section']], left_on='Sample',
+                                    right_on='Sample Reference', how='left')
+        else:
+            df_plot = df_plot.assign(Section='Desconhecido')
+        df_plot = df_plot.rename(columns=NORM_COLUMNS).dropna(subset=list(NORM_COLUMNS.values()))
+    if df_plot.empty:
+        return df_plot, df_plot
+    with stage("outliers"):
+        flags = flag_log_ratios(df_plot, list(NORM_COLUMNS.values()), support_fraction=support_fraction)
+    return df_plot, df_plot[flags]
+
+
+if __name__ == "__main__":
+    from data_store import STORE_PATH, DataStore, load_site_frames
+
+    # Samples Section 2 of the page (and the paper) names as atypical
+    PAPER_OUTLIERS = {'ditch1': {163, 183}}
+
+    site = sys.argv[1] if len(sys.argv) > 1 else "ditch1"
+    df_ref, df_chem = load_site_frames(DataStore(STORE_PATH), site)
+    flagged = {int(s) for s in figure5_frame(df_chem, df_ref)[1]['Sample']}
+    print(f"{site}: {sorted(flagged)}")
+    if site in PAPER_OUTLIERS and flagged != PAPER_OUTLIERS[site]:
+        print(f"expected {sorted(PAPER_OUTLIERS[site])}")
+        sys.exit(1)
@@ -0,0 +1,146 @@
+"""Nearest-reference provenance lookup.
+
+Every reference sample from every site in the store is projected into log
+ratio space (element / reference element) and indexed in a KD-tree. The
+index is built once per store version and pickled next to the store, so a
+query for a new sherd's NAA fingerprint only walks the tree.
+"""
+import os
+import pickle
+import re
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from chemistry import ratio_matrix
+from clustering import feature_matrix, prune_cache
+
+INDEX_FORMAT = 2  # part of the pickle name; bump when the indexed features change
+MIN_FEATURE_SHARE = 0.5  # queries measuring fewer of the indexed features are not matched
+
+ProvenanceIndex = namedtuple("ProvenanceIndex", ["version", "reference", "features", "medians", "metadata", "tree"])
+
+
+def _features(df_chem, reference, features, medians):
+    """(samples, log-ratio feature rows, measured features per row) for ``df_chem``.
+
+    Gaps are filled from the index medians; the counts tell how much of a row is real.
+    """
+    df_log = ratio_matrix(df_chem, reference, log=True)
+    values = df_log.reindex(columns=features).to_numpy(dtype=np.float64, copy=True)
+    missing = np.isnan(values)
+    values[missing] = np.take(medians, np.nonzero(missing)[1])
+    return df_log['Sample'].to_numpy(), values, len(features) - missing.sum(axis=1)
+
+
+def min_features(index):
+    """Fewest indexed features a query row must measure to be matched."""
+    return int(np.ceil(MIN_FEATURE_SHARE * len(index.features)))
+
+
+def feature_coverage(index, df_chem):
+    """(measured features per query sample, indexed features absent from every row).
+
+    Raises KeyError if ``df_chem`` lacks the index's reference element.
+    """
+    samples, _, measured = _features(df_chem, index.reference, index.features, index.medians)
+    columns = set(df_chem.columns)
+    absent = [f for f in index.features if f not in columns]
+    return pd.Series(measured, index=pd.Index(samples, name='Sample'), name='Features'), absent
+
+
+def build_index(store, reference='Sc'):
+    """Indexes every site of ``store`` that has chemistry and the reference element."""
+    frames, metadata = [], []
+    for site in store.sites():
+        if 'chemistry' not in store.tables(site):
+            continue
+        df_chem = store.read(site, 'chemistry')
+        if reference not in df_chem.columns:
+            continue
+        df_log = ratio_matrix(df_chem, reference, log=True)
+
+        meta = pd.DataFrame({'Site': site, 'Sample': df_log['Sample'].to_numpy()})
+        if 'reference' in store.tables(site):
+            df_ref = store.read(site, 'reference', columns=['Sample Reference', 'Section', 'Type'])
+            meta = meta.merge(df_ref, left_on='Sample', right_on='Sample Reference', how='left').drop(columns='Sample Reference')
+        frames.append(df_log)
+        metadata.append(meta)
+
+    if not frames:
+        raise ValueError(f"no site in the store has chemistry with '{reference}'")
+
+    # Sites may report different element lists; keep the elements most of them share
+    df_all = pd.concat(frames, ignore_index=True)
+    _, _, features = feature_matrix(df_all)
+    medians = np.nanmedian(df_all[features].to_numpy(dtype=np.float64), axis=0)
+    values = df_all[features].to_numpy(dtype=np.float64, copy=True)
+    missing = np.isnan(values)
+    values[missing] = np.take(medians, np.nonzero(missing)[1])
+
+    return ProvenanceIndex(
+        version=store.version, reference=reference, features=features, medians=medians,
+        metadata=pd.concat(metadata, ignore_index=True), tree=cKDTree(values),
+    )
+
+
+def cached_index(store, cache_dir, reference='Sc'):
+    """Loads the pickled index for the current store version, building it if needed.
+
+    Building one deletes the pickles of other store versions for ``reference``.
+    """
+    cache_dir = Path(cache_dir)
+    path = cache_dir / f"provenance-{reference}-{store.version}-v{INDEX_FORMAT}.pkl"
+    if path.exists():
+        with path.open("rb") as f:
+            return pickle.load(f)
+
+    index = build_index(store, reference)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp.open("wb") as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp.replace(path)
+    # Indexes of earlier store versions (and earlier index formats) are superseded
+    prune_cache(cache_dir, rf"provenance-{re.escape(reference)}-[0-9a-f]+(-v\d+)?\.pkl", keep=[path])
+    return index
+
+
+def nearest_references(index, df_chem, k=5, exclude_self=None):
+    """The ``k`` closest indexed samples for every row of ``df_chem``.
+
+    ``df_chem`` uses the app layout ('Sample' plus element columns).
+    ``exclude_self`` is an optional site key: matches with the same site and
+    sample number as the query are skipped. Rows measuring fewer than
+    ``min_features(index)`` of the indexed features are not matched; if no
+    row qualifies a ValueError is raised. Returns one row per match with the
+    query sample, rank, distance, the query's measured 'Features' and the
+    reference metadata ('Site', 'Sample', 'Section', 'Type').
+    """
+    samples, values, measured = _features(df_chem, index.reference, index.features, index.medians)
+    if len(values) == 0:
+        return pd.DataFrame(columns=['Query', 'Rank', 'Distance', 'Features'] + list(index.metadata.columns))
+    enough = measured >= min_features(index)
+    if not enough.any():
+        raise ValueError(f"the query measures at most {measured.max()} of the {len(index.features)} indexed "
+                         f"features; at least {min_features(index)} are needed")
+    samples, values, measured = samples[enough], values[enough], measured[enough]
+
+    k_query = min(k + (exclude_self is not None), index.tree.n)
+    distances, positions = index.tree.query(values, k=k_query)
+    distances = distances.reshape(len(values), -1)
+    positions = positions.reshape(len(values), -1)
+
+    matches = index.metadata.iloc[positions.ravel()].reset_index(drop=True)
+    matches.insert(0, 'Features', np.repeat(measured, positions.shape[1]))
+    matches.insert(0, 'Distance', distances.ravel())
+    matches.insert(0, 'Query', np.repeat(samples, positions.shape[1]))
+    if exclude_self is not None:
+        is_self = (matches['Site'] == exclude_self) & (matches['Sample'] == matches['Query'])
+        matches = matches[~is_self]
+    matches = matches.groupby('Query', sort=False).head(k).reset_index(drop=True)
+    matches.insert(1, 'Rank', matches.groupby('Query').cumcount() + 1)
+    return matches
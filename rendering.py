@@ -0,0 +1,121 @@
+"""Content-addressed cache for rendered matplotlib figures.
+
+A figure is identified by a hash of the data it plots and the plot
+parameters. On a hit the stored PNG/SVG bytes are returned and matplotlib
+never runs; on a miss the figure is drawn, serialized and closed right away
+so no Figure objects accumulate across sessions. Entries evicted from memory
+can spill to a directory on disk, which is itself capped: the least
+recently used files are deleted once it grows past ``max_spill_bytes``.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_SPILL_BYTES = 256 * 1024 * 1024
+
+
+def content_key(*parts):
+    """Stable hash of DataFrames, arrays and plain values."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, (pd.DataFrame, pd.Series)):
+            names = list(part.columns) if isinstance(part, pd.DataFrame) else [part.name]
+            digest.update(repr(names).encode())
+            digest.update(pd.util.hash_pandas_object(part, index=True).to_numpy().tobytes())
+        elif isinstance(part, np.ndarray):
+            digest.update(repr((part.dtype.str, part.shape)).encode())
+            digest.update(np.ascontiguousarray(part).tobytes())
+        else:
+            digest.update(repr(part).encode())
+        digest.update(b"\x00")
+    return digest.hexdigest()[:24]
+
+
+class FigureCache:
+    """Bounded LRU of rendered image bytes, optionally spilling evictions to disk."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, spill_dir=None, max_spill_bytes=DEFAULT_MAX_SPILL_BYTES):
+        self.max_bytes = max_bytes
+        self.spill_dir = Path(spill_dir) if spill_dir is not None else None
+        self.max_spill_bytes = max_spill_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _spill_path(self, key, fmt):
+        return self.spill_dir / f"{key}.{fmt}"
+
+    def get(self, key, fmt):
+        with self._lock:
+            data = self._entries.get((key, fmt))
+            if data is not None:
+                self._entries.move_to_end((key, fmt))
+                return data
+        if self.spill_dir is not None:
+            path = self._spill_path(key, fmt)
+            try:
+                data = path.read_bytes()
+                os.utime(path)  # mtime is the disk LRU order
+            except FileNotFoundError:  # never spilled, or trimmed (possibly by another process)
+                return None
+            self.put(key, fmt, data)
+            return data
+        return None
+
+    def put(self, key, fmt, data):
+        with self._lock:
+            if (key, fmt) in self._entries:
+                return
+            self._entries[(key, fmt)] = data
+            self._size += len(data)
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                (old_key, old_fmt), old_data = self._entries.popitem(last=False)
+                self._size -= len(old_data)
+                if self.spill_dir is not None:
+                    self._spill(old_key, old_fmt, old_data)
+
+    def _spill(self, key, fmt, data):
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        path = self._spill_path(key, fmt)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        tmp.replace(path)
+        self._trim_spill()
+
+    def _trim_spill(self):
+        """Deletes the least recently used spilled files until the directory fits ``max_spill_bytes``."""
+        files = []
+        for entry in os.scandir(self.spill_dir):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_spill_bytes:
+                break
+            Path(path).unlink(missing_ok=True)
+            total -= size
+
+    def render(self, key, draw, fmt="png", dpi=100):
+        """Returns image bytes for ``key``, calling ``draw()`` -> Figure only on a miss."""
+        data = self.get(key, fmt)
+        if data is not None:
+            self.hits += 1
+            return data
+
+        self.misses += 1
+        buffer = io.BytesIO()
+        draw().savefig(buffer, format=fmt, dpi=dpi, bbox_inches="tight")
+        data = buffer.getvalue()
+        self.put(key, fmt, data)
+        return data
@@ -0,0 +1,83 @@
+"""Compact dtypes for the reference, mineralogy and chemistry tables.
+
+``pd.read_csv`` gives int64 ids and percentages, float64 chemistry and
+object/str columns for the repeated type labels ("1—plate", "5—spherical").
+``compact`` maps each table onto the smallest dtypes that hold its values:
+categoricals for the labels, small ints for sections, ids and mineral
+percentages and float32 for chemistry (3 significant digits from NAA fit
+comfortably). The store is written with these dtypes, so every frame the
+app caches, pickles and copies per session is the compact one.
+
+    python schema.py [site]   # memory of the default vs compact frames
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Per table: column -> dtype, '*' for every other column
+SCHEMAS = {
+    'reference': {'Sample Reference': 'int32', 'SU': 'category', 'Section': 'int8',
+                  'Type': 'category', 'Sub-Type': 'category', '*': 'category'},
+    'mineralogy': {'Sample': 'int32', 'Section': 'int8', '*': 'uint8'},
+    'chemistry': {'Sample': 'int32', '*': 'float32'},
+    'chemistry_flags': {'Sample': 'int32', '*': 'uint8'},
+    'chemistry_limits': {'Sample': 'int32', '*': 'float32'},
+}
+
+
+def _to_int(series, dtype):
+    """Casts to ``dtype`` if every value is a whole number in range, else float32."""
+    info = np.iinfo(dtype)
+    array = series.to_numpy(dtype=np.float64)
+    if (not np.isnan(array).any() and (array == np.round(array)).all()
+            and (array.size == 0 or (array.min() >= info.min and array.max() <= info.max))):
+        return series.astype(dtype)
+    return series.astype(np.float32)  # decimals, gaps or out of range
+
+
+def compact(df, table):
+    """Returns ``df`` with the schema of ``table`` applied (unknown tables unchanged)."""
+    schema = SCHEMAS.get(table)
+    if schema is None:
+        return df
+    columns = {}
+    for name in df.columns:
+        series, dtype = df[name], schema.get(name, schema.get('*'))
+        if dtype is None or series.dtype == dtype:
+            columns[name] = series
+        elif dtype == 'category':
+            columns[name] = series.astype('category')
+        elif not pd.api.types.is_numeric_dtype(series):
+            columns[name] = series  # free text where numbers were expected: left as is
+        elif dtype == 'float32':
+            columns[name] = series.astype(np.float32)
+        else:
+            columns[name] = _to_int(series, np.dtype(dtype))
+    return pd.DataFrame(columns, index=df.index)
+
+
+def frame_bytes(df):
+    """Deep memory of a frame (object/str contents included)."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def memory_report(before, after):
+    """{name: frame} before/after -> DataFrame of bytes per table and the saving."""
+    rows = [{'table': name, 'rows': len(after[name]), 'before_bytes': frame_bytes(before[name]),
+             'after_bytes': frame_bytes(after[name])} for name in before if name in after]
+    report = pd.DataFrame(rows, columns=['table', 'rows', 'before_bytes', 'after_bytes'])
+    report['saving'] = 1 - report['after_bytes'] / report['before_bytes']
+    return report
+
+
+if __name__ == "__main__":
+    from data_store import DATA_PATH, read_site_tables
+
+    site = sys.argv[1] if len(sys.argv) > 1 else "ditch1"
+    before = read_site_tables(DATA_PATH / site)
+    after = {name: compact(df, name) for name, df in before.items()}
+    report = memory_report(before, after)
+    print(report.to_string(index=False, formatters={'saving': '{:.0%}'.format}))
+    total_before, total_after = report['before_bytes'].sum(), report['after_bytes'].sum()
+    print(f"total: {total_before} -> {total_after} bytes ({1 - total_after / total_before:.0%} smaller)")
@@ -0,0 +1,324 @@
+"""Static, pre-rendered snapshot of the page for read-only traffic.
+
+Renders the text of ``content.py``, the logo, Figures 2 and 4, the section 3
+tables and the matplotlib figures once, into a folder any plain file server
+can serve:
+
+    python snapshot.py --out ./snapshot --site ditch1
+
+Images and the stylesheet get content-hashed names (``figure5-1a2b3c4d5e.png``)
+so they can be cached forever; ``index.html`` and the CSS also get a gzip
+sibling (``.gz``) for servers that serve precompressed files. Widgets (filters,
+the reference-element choice, PCA uploads) stay in the live app; the snapshot
+shows the default view.
+"""
+import argparse
+import gzip
+import hashlib
+import html
+import io
+import json
+import os
+import re
+from pathlib import Path
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import pandas as pd  # noqa: E402
+
+import content  # noqa: E402
+import mineralogy  # noqa: E402
+from chemistry import pearson_pairwise, ratio_matrix  # noqa: E402
+from clustering import N_CLUSTERS, build_tree, feature_matrix  # noqa: E402
+from data_store import DATA_PATH, STORE_PATH, DataStore, load_site_frames, refresh_store  # noqa: E402
+from figures import draw_correlation, draw_dendrogram, draw_figure5, draw_ternary  # noqa: E402
+from outliers import figure5_frame  # noqa: E402
+
+MAX_TABLE_ROWS = 500
+GZIP_SUFFIXES = {'.html', '.css'}
+
+STYLE = """
+body { font-family: "Source Sans Pro", sans-serif; max-width: 960px; margin: 0 auto; padding: 2rem 1rem; color: #31333f; line-height: 1.6; }
+header { display: flex; align-items: center; margin-bottom: 20px; }
+header img { margin-right: 20px; }
+header h1 { margin: 0; font-size: 40px; line-height: 1.2; } header h2 { margin: 0; font-size: 22px; line-height: 1.2; }
+details { border: 1px solid #e6e9ef; border-radius: 0.5rem; padding: 0.5rem 1rem; margin: 0.5rem 0; }
+summary { cursor: pointer; font-weight: 600; }
+.table-wrap { overflow-x: auto; max-height: 420px; overflow-y: auto; margin: 0.5rem 0; }
+table { border-collapse: collapse; font-size: 0.85em; }
+th, td { border: 1px solid #e6e9ef; padding: 2px 6px; text-align: right; }
+figure { margin: 1rem 0; } figure img { max-width: 100%; }
+.caption, figcaption { color: #808495; font-size: 0.85em; }
+"""
+
+
+# --- Markdown subset used by content.py ---
+def _inline(text):
+    text = html.escape(text, quote=False)
+    text = re.sub(r"\[([^\]]+)\]\(([^)\s]+)\)", r'<a href="\2">\1</a>', text)
+    text = re.sub(r"\*\*(.+?)\*\*", r"<b>\1</b>", text, flags=re.S)
+    return re.sub(r"\*(.+?)\*", r"<i>\1</i>", text, flags=re.S)
+
+
+def _list(lines):
+    """Nested <ul> from '*   item' lines (4 spaces per level)."""
+    out, depth = [], -1
+    for line in lines:
+        level = (len(line) - len(line.lstrip(' '))) // 4
+        item = _inline(line.strip()[1:].strip())
+        if level > depth:
+            out.append("<ul>" * (level - depth))  # opened inside the still-open parent item
+        else:
+            out.append("</li>" + "</ul></li>" * (depth - level))
+        out.append(f"<li>{item}")
+        depth = level
+    out.append("</li>" + "</ul></li>" * depth + "</ul>")
+    return "".join(out)
+
+
+def markdown_to_html(text):
+    """Converts the markdown used in ``content.py`` (paragraphs, lists, bold/italic, links, rules).
+
+    Blocks starting with '<' are already HTML and are kept as they are.
+    """
+    blocks = []
+    for block in re.split(r"\n\s*\n", text.strip("\n")):
+        lines = [line for line in block.split("\n") if line.strip()]
+        if not lines:
+            continue
+        first = lines[0].strip()
+        if first.startswith("<"):
+            blocks.append(block)
+        elif first == "---":
+            blocks.append("<hr>")
+        elif first.startswith("### "):
+            blocks.append(f"<h3>{_inline(first[4:])}</h3>")
+        elif first.startswith("* "):
+            blocks.append(_list(lines))
+        else:
+            blocks.append(f"<p>{_inline(' '.join(line.strip() for line in lines))}</p>")
+    return "\n".join(blocks)
+
+
+# --- Fingerprinted assets ---
+class Assets:
+    """Writes files as ``<stem>-<sha256[:10]><suffix>`` and remembers what was written."""
+
+    def __init__(self, out_dir):
+        self.out_dir = Path(out_dir)
+        self.files = {}
+
+    def add(self, name, data):
+        stem, suffix = Path(name).stem, Path(name).suffix
+        fingerprinted = f"assets/{stem}-{hashlib.sha256(data).hexdigest()[:10]}{suffix}"
+        path = self.out_dir / fingerprinted
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            _write_atomic(path, data)
+        self.files[name] = fingerprinted
+        return fingerprinted
+
+    def add_file(self, path):
+        return self.add(Path(path).name, Path(path).read_bytes())
+
+    def add_figure(self, name, fig):
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", dpi=120, bbox_inches="tight", metadata={"Software": None})
+        return self.add(name, buffer.getvalue())
+
+
+def _figure(assets, name, fig, caption=""):
+    src = assets.add_figure(name, fig)
+    caption = f"<figcaption>{html.escape(caption)}</figcaption>" if caption else ""
+    return f'<figure><img src="{src}" alt="{html.escape(name)}" loading="lazy">{caption}</figure>'
+
+
+def _caption(text):
+    return f'<p class="caption">{html.escape(text)}</p>'
+
+
+def _table(df, index=False):
+    shown = df.head(MAX_TABLE_ROWS)
+    table = shown.to_html(index=index, border=0, na_rep="n.d.", float_format=lambda v: f"{v:.3g}")
+    note = f'<p class="caption">Mostradas as primeiras {MAX_TABLE_ROWS} de {len(df)} linhas.</p>' if len(df) > MAX_TABLE_ROWS else ""
+    return f'<div class="table-wrap">{table}</div>{note}'
+
+
+# --- Section 3 ---
+def _figure5_html(assets, df_ref, df_chem, reference):
+    try:
+        df_plot, df_outliers = figure5_frame(df_chem, df_ref, reference)
+    except KeyError:
+        return ""
+    if df_plot.empty:
+        return ""
+    caption = content.FIGURE5_CAPTION.format(
+        samples=', '.join(str(int(x)) for x in df_outliers['Sample']) or content.FIGURE5_NO_OUTLIERS)
+    return (f"<h4>{html.escape(content.FIGURE5_TITLE.format(reference=reference))}</h4>"
+            f"<p><i>{html.escape(content.FIGURE5_SOURCE)}</i></p>"
+            + _figure(assets, "figure5.png", draw_figure5(df_plot, df_outliers, reference), caption))
+
+
+def section_3_html(assets, store, site, reference='Sc'):
+    """Tables and figures of section 3 in their default view."""
+    df_ref, df_chem = load_site_frames(store, site)
+    parts = [f"<h3>{html.escape(content.SAMPLES_TITLE)}</h3>"]
+    if df_ref is not None and 'Section' in df_ref.columns:
+        counts = df_ref['Section'].value_counts().sort_index()
+        parts.append(_caption(" · ".join(content.SECTOR_COUNT.format(section=s, count=n) for s, n in counts.items())))
+        parts.append(_table(df_ref.sort_values('Sample Reference')))
+
+    parts.append(f"<h3>{html.escape(content.MINERALOGY_TITLE)}</h3>")
+    df_long = mineralogy.long_frame(store, [site])
+    if not df_long.empty:
+        parts.append(f"<h4>{html.escape(content.MINERAL_MEANS_TITLE)}</h4>" + _table(mineralogy.group_means(df_long).round(1), index=True))
+        parts.append(_table(mineralogy.group_quantiles(df_long).round(1)))
+        parts.append(_caption(content.MINERAL_QUANTILES_CAPTION))
+        vertices = [m for m in mineralogy.TERNARY_MINERALS if m in df_long['Mineral'].cat.categories]
+        if len(vertices) == 3:
+            df_density = mineralogy.ternary_density(df_long, tuple(vertices))
+            parts.append(_figure(assets, "ternary.png", draw_ternary(df_density, vertices), content.TERNARY_CAPTION))
+
+    parts.append(f"<h3>{html.escape(content.CHEMISTRY_TITLE)}</h3>")
+    if df_chem is not None and 'Sample' in df_chem.columns:
+        parts.append(f"<h4>{html.escape(content.CHEMISTRY_TABLE_TITLE)}</h4>" + _table(df_chem))
+        if reference in df_chem.columns:
+            parts.append(_figure5_html(assets, df_ref, df_chem, reference))
+
+            df_log = ratio_matrix(df_chem, reference, log=True)
+            if len(df_log) >= 2:
+                samples, X, features = feature_matrix(df_log)
+                tree = build_tree(samples, X, features)
+                parts.append(f"<h4>{html.escape(content.CLUSTERING_TITLE.format(reference=reference))}</h4>")
+                parts.append(_figure(assets, "dendrogram.png", draw_dendrogram(tree, min(N_CLUSTERS, len(tree.leaves)))))
+
+        elements = [c for c in df_chem.columns if c != 'Sample']
+        r, counts = pearson_pairwise(df_chem[elements].to_numpy())
+        if counts.max() >= 3:
+            parts.append(f"<h4>{html.escape(content.CORRELATION_TITLE)}</h4>")
+            parts.append(_figure(assets, "correlation.png", draw_correlation(pd.DataFrame(r, index=elements, columns=elements), int(counts.max())),
+                                 content.CORRELATION_CAPTION))
+    parts.append(_caption("Filtros, outros elementos de referência, a PCA e o índice de proveniência "
+                          "estão disponíveis na aplicação interativa."))
+    return "\n".join(parts)
+
+
+# --- Page ---
+def _closing_html():
+    parts = []
+    for kind, text in content.CLOSING:
+        if kind == "divider":
+            parts.append("<hr>")
+        elif kind == "subheader":
+            parts.append(f"<h3>{html.escape(text)}</h3>")
+        elif kind == "caption":
+            parts.append(_caption(text))
+        elif kind == "html":
+            parts.append(text)
+        else:
+            parts.append(markdown_to_html(text))
+    return "\n".join(parts)
+
+
+def _details(title, body):
+    return f"<details>\n<summary>{html.escape(title)}</summary>\n{body}\n</details>"
+
+
+def render_page(assets, store, site, reference='Sc'):
+    """The whole page as one HTML string; images and CSS are written through ``assets``."""
+    logo = assets.add_file(content.LOGO_PATH) if Path(content.LOGO_PATH).exists() else None
+    stylesheet = assets.add("style.css", STYLE.encode("utf-8"))
+    figure_2 = assets.add_file("figure_2.png") if Path("figure_2.png").exists() else None
+    figure_4 = assets.add_file("figure_4.png") if Path("figure_4.png").exists() else None
+
+    section_1 = content.SECTION_1 + (f'<figure><img src="{figure_2}" alt="Figura 2" loading="lazy"></figure>' if figure_2 else "")
+    section_2 = content.SECTION_2 + (f'<figure><img src="{figure_4}" alt="Figura 4" loading="lazy"></figure>' if figure_4 else "")
+    logo_html = f'<img src="{logo}" alt="Logo" width="{content.LOGO_WIDTH_PX}">' if logo else ""
+    body = "\n".join([
+        f"<header>{logo_html}<div><h1>{html.escape(content.TITLE)}</h1><h2>{html.escape(content.SUBTITLE)}</h2></div></header>",
+        markdown_to_html(content.INTRO),
+        _details(content.SECTION_1_TITLE, section_1),
+        _details(content.SECTION_2_TITLE, section_2),
+        _details(content.SECTION_3_TITLE, section_3_html(assets, store, site, reference)),
+        _details(content.SECTION_4_TITLE, content.SECTION_4),
+        _closing_html(),
+    ])
+    return (f'<!DOCTYPE html>\n<html lang="pt">\n<head>\n<meta charset="utf-8">\n'
+            f'<meta name="viewport" content="width=device-width, initial-scale=1">\n'
+            f"<title>{html.escape(content.PAGE_TITLE)}</title>\n"
+            f'<link rel="stylesheet" href="{stylesheet}">\n</head>\n<body>\n{body}\n</body>\n</html>\n')
+
+
+def _write_atomic(path, data):
+    # Readers (the file server) see the old file or the new one, never a partial write
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    tmp.replace(path)
+
+
+def _write_gzip(path):
+    # mtime=0 keeps the .gz bytes identical across identical exports
+    _write_atomic(path.with_name(f"{path.name}.gz"), gzip.compress(path.read_bytes(), compresslevel=9, mtime=0))
+
+
+def _previous_assets(out_dir):
+    try:
+        return set(json.loads((out_dir / "manifest.json").read_text(encoding="utf-8"))["assets"].values())
+    except (OSError, ValueError, KeyError):
+        return set()
+
+
+def export(out_dir, store, site, reference='Sc'):
+    """Writes index.html, fingerprinted assets, .gz siblings and manifest.json; returns the manifest.
+
+    Assets are written before the page that references them, and the previous
+    export's assets are kept, so a page loaded before the export still finds
+    its files. Anything older is removed.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    previous = _previous_assets(out_dir)
+    assets = Assets(out_dir)
+    page = render_page(assets, store, site, reference).encode("utf-8")
+
+    current = set(assets.files.values())
+    written = [*sorted(current), "index.html"]
+    for name in sorted(current):
+        if Path(name).suffix in GZIP_SUFFIXES:
+            _write_gzip(out_dir / name)
+    _write_atomic(out_dir / "index.html", page)
+    _write_gzip(out_dir / "index.html")
+    manifest = {"site": site, "site_version": store.site_version(site), "reference": reference,
+                "assets": assets.files,
+                "files": {name: (out_dir / name).stat().st_size for name in written}}
+    _write_atomic(out_dir / "manifest.json", json.dumps(manifest, indent=1, ensure_ascii=False).encode("utf-8"))
+
+    # Assets (and leftover temp files) neither this export nor the previous one references
+    keep = current | previous
+    for path in (out_dir / "assets").iterdir():
+        name = f"assets/{path.name.removesuffix('.gz')}"
+        if name not in keep:
+            path.unlink()
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the page as a static, precompressed HTML bundle.")
+    parser.add_argument("--data", type=Path, default=DATA_PATH, help="root of the site/ditch CSV folders")
+    parser.add_argument("--store", type=Path, default=STORE_PATH, help="columnar store to (incrementally) refresh")
+    parser.add_argument("--out", type=Path, default=Path("./snapshot"), help="output directory")
+    parser.add_argument("--site", default="ditch1", help="site key shown in section 3")
+    parser.add_argument("--reference", default="Sc", help="normalization element")
+    args = parser.parse_args(argv)
+
+    refresh_store(args.data, args.store)
+    manifest = export(args.out, DataStore(args.store), args.site, args.reference)
+    total = sum(manifest["files"].values())
+    print(f"{args.out / 'index.html'}: {len(manifest['files'])} files, {total / 1024:.0f} KiB")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())